@@ -1,60 +1,748 @@
 import toml
+import io
 import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import json
+import math
+import mmap
+import codecs
+from array import array
+from collections import Counter, deque
+from contextlib import contextmanager
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatchcase
 from zipfile import ZipFile, ZipInfo
 
+GLOB_CHARS = re.compile(r'[*?\[]')
+# Подстановки шаблона целиком: * и ?, а также класс [...] (как его понимает fnmatch);
+# между ними остаются буквальные фрагменты имени
+GLOB_WILDCARDS = re.compile(r'[*?]|\[!?\]?[^\]]*\]')
+WORD = re.compile(rb'\S+')
+# Флаги du: s — только итог, h — размеры в K/M/G, z — сжатые размеры
+DU_FLAGS = "shz"
+# Размер блока при потоковом чтении содержимого файлов
+CHUNK_SIZE = 64 * 1024
+
+
+# Узел дерева каталогов архива
+class DirectoryNode:
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        # Имя -> DirectoryNode для подкаталогов или ZipInfo для файлов,
+        # в порядке появления в архиве
+        self.entries = {}
+        # Суммарные размеры и число файлов во всём поддереве
+        self.size = 0
+        self.compressed_size = 0
+        self.file_count = 0
+
+    def child_dir(self, name):
+        node = self.entries.get(name)
+        if isinstance(node, DirectoryNode):
+            return node
+        return None
+
+
+# Индекс архива: дерево каталогов, построенное один раз по центральному каталогу
+class ArchiveIndex:
+    def __init__(self, infolist=()):
+        self.root = DirectoryNode("")
+        # Порядковый номер каждой записи, чтобы выдавать результаты в порядке архива
+        self.order = {}
+        # Имя файла -> полные пути записей с таким именем
+        self.basenames = {}
+        # Триграмма -> множество имён файлов, в которых она встречается
+        self.trigrams = {}
+        for info in infolist:
+            self.add(info)
+
+    @staticmethod
+    def split_path(name):
+        return [part for part in name.split("/") if part]
+
+    @staticmethod
+    def get_trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, info):
+        self.order.setdefault(info.filename, len(self.order))
+        parts = self.split_path(info.filename)
+        if not parts:
+            return
+        if not info.filename.endswith("/"):
+            self.add_basename(parts[-1], info.filename)
+        is_dir = info.filename.endswith("/")
+        node = self.root
+        for part in (parts if is_dir else parts[:-1]):
+            child = node.child_dir(part)
+            if child is None:
+                child = DirectoryNode(part, node)
+                node.entries[part] = child
+            node = child
+        if not is_dir:
+            previous = node.entries.get(parts[-1])
+            if isinstance(previous, ZipInfo):
+                self.update_totals(node, -previous.file_size, -previous.compress_size, -1)
+            node.entries[parts[-1]] = info
+            self.update_totals(node, info.file_size, info.compress_size, 1)
+
+    # Обновляет агрегаты каталога и всех его предков
+    @staticmethod
+    def update_totals(node, size, compressed_size, count):
+        while node is not None:
+            node.size += size
+            node.compressed_size += compressed_size
+            node.file_count += count
+            node = node.parent
+
+    def add_basename(self, basename, name):
+        paths = self.basenames.get(basename)
+        if paths is None:
+            self.basenames[basename] = [name]
+            for trigram in self.get_trigrams(basename):
+                self.trigrams.setdefault(trigram, set()).add(basename)
+        else:
+            paths.append(name)
+
+    # Кандидаты из имён файлов, содержащих все фрагменты длиной от трёх символов
+    def candidate_basenames(self, fragments):
+        trigrams = set()
+        for fragment in fragments:
+            trigrams |= self.get_trigrams(fragment)
+        if not trigrams:
+            return self.basenames.keys()
+        # Пересекаем, начиная с самых редких триграмм, чтобы множества быстро сужались
+        postings = sorted((self.trigrams.get(trigram, set()) for trigram in trigrams), key=len)
+        candidates = postings[0]
+        for found in postings[1:]:
+            if not candidates:
+                break
+            candidates = candidates & found
+        return candidates
+
+    # Поиск файлов: шаблон с *, ? или [...] сопоставляется с именем файла,
+    # обычная строка — с концом полного пути
+    def find(self, pattern, scope=()):
+        if GLOB_CHARS.search(pattern):
+            fragments = GLOB_WILDCARDS.split(pattern)
+            basenames = [basename for basename in self.candidate_basenames(fragments)
+                         if fnmatchcase(basename, pattern)]
+            names = [name for basename in basenames for name in self.basenames[basename]]
+        elif "/" in pattern:
+            basename = pattern.rsplit("/", 1)[1]
+            names = [name for name in self.basenames.get(basename, ())
+                     if name.endswith(pattern)]
+        else:
+            basenames = [basename for basename in self.candidate_basenames([pattern])
+                         if basename.endswith(pattern)]
+            names = [name for basename in basenames for name in self.basenames[basename]]
+
+        if scope:
+            depth = len(scope)
+            names = [name for name in names
+                     if self.split_path(name)[:depth] == list(scope)]
+        return sorted(names, key=self.order.__getitem__)
+
+    def get_dir(self, parts):
+        node = self.root
+        for part in parts:
+            node = node.child_dir(part)
+            if node is None:
+                return None
+        return node
+
+    def contains(self, name):
+        parts = self.split_path(name)
+        if not parts:
+            return True
+        parent = self.get_dir(parts[:-1])
+        return parent is not None and parts[-1] in parent.entries
+
+    def get_entry(self, parts):
+        if not parts:
+            return self.root
+        parent = self.get_dir(parts[:-1])
+        if parent is None:
+            return None
+        return parent.entries.get(parts[-1])
+
+
+# Замеры времени команд по фазам: открытие архива, работа с индексом,
+# сама операция и запись изменений. Для stats хранятся только длительности
+# по командам; полные записи (со строкой команды) копятся лишь для JSON-трассы
+class CommandProfiler:
+    PHASES = ("open", "index", "operate", "flush")
+
+    def __init__(self, keep_records=False):
+        self.keep_records = keep_records
+        self.records = []
+        # Команда -> длительности её запусков в секундах
+        self.durations = {}
+        self.phase_totals = dict.fromkeys(self.PHASES, 0.0)
+        # Последняя завершённая команда (для префикса time)
+        self.last = None
+        self.current = None
+
+    # Замер команды; вложенные вызовы относятся к уже начатой команде
+    @contextmanager
+    def command(self, line):
+        if self.current is not None:
+            yield self.current
+            return
+        record = {"command": line.split(" ", 1)[0], "line": line,
+                  "phases": dict.fromkeys(self.PHASES, 0.0), "total": 0.0}
+        self.current = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["total"] = time.perf_counter() - start
+            other = sum(record["phases"].values())
+            record["phases"]["operate"] = max(record["total"] - other, 0.0)
+            self.durations.setdefault(record["command"], array("d")).append(record["total"])
+            for name, value in record["phases"].items():
+                self.phase_totals[name] += value
+            self.last = record
+            if self.keep_records:
+                self.records.append(record)
+            self.current = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.current is not None:
+                self.current["phases"][name] += time.perf_counter() - start
+
+    @staticmethod
+    def percentile(values, p):
+        # Метод ближайшего ранга по отсортированному списку
+        return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+    @staticmethod
+    def format_record(record):
+        phases = ", ".join(f"{name} {record['phases'][name] * 1000:.3f}" for name in CommandProfiler.PHASES)
+        return f"real {record['total'] * 1000:.3f} мс ({phases})"
+
+    def report(self):
+        if not self.durations:
+            return ["Нет данных о командах."]
+        lines = [f"{'команда':<10}{'n':>6}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (мс)"]
+        for name, durations in sorted(self.durations.items()):
+            totals = sorted(duration * 1000 for duration in durations)
+            lines.append(f"{name:<10}{len(totals):>6}"
+                         + "".join(f"{self.percentile(totals, p):>10.3f}" for p in (50, 90, 99))
+                         + f"{totals[-1]:>10.3f}")
+        lines.append("фазы: " + ", ".join(f"{name} {value * 1000:.3f} мс" for name, value in self.phase_totals.items()))
+        return lines
+
+    def dump(self, trace_file):
+        with open(trace_file, 'w') as file:
+            json.dump({"records": self.records}, file, ensure_ascii=False, indent=2)
+
+
+# Файловый интерфейс к отображённому в память архиву для ZipFile.
+# mmap.seek за пределы файла бросает ValueError, а zipfile ожидает OSError
+# (например, при поиске записи zip64 в очень маленьком архиве)
+class MappedFile:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        try:
+            return self.map.seek(offset, whence)
+        except ValueError as e:
+            raise OSError(e)
+
+    def tell(self):
+        return self.map.tell()
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.map.read(size)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+# Атомарная запись файла: содержимое готовится во временном файле рядом с целевым
+# и подменяет его через os.replace, так что сбой во время записи не портит файл.
+# before_replace вызывается перед заменой (например, чтобы закрыть открытый целевой файл:
+# на Windows открытый файл заменить нельзя)
+def write_atomically(path, write, before_replace=None):
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        write(tmp_path)
+        with open(tmp_path, 'rb+') as tmp_file:
+            os.fsync(tmp_file.fileno())
+        if before_replace is not None:
+            before_replace()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Вывод команды сразу в поток: строки печатаются по мере появления, а не копятся в списке
+class ConsoleOutput:
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def append(self, line):
+        print(line, file=self.stream)
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+
 class ZipEmulator:
-    def __init__(self, zip_file):
+    def __init__(self, zip_file, session=False, trace_file=None, overlay=False, sidecar=None, use_mmap=False):
         self.zip_file = zip_file
         self.path = []
+        # Открытый дескриптор архива и отложенные записи (имя -> (ZipInfo, данные)) в режиме сессии
+        self.handle = None
+        self.pending = {}
+        # Режим overlay: базовый архив только читается, изменения живут в слое pending
+        # (и в файле-спутнике sidecar, если он задан) до явного commit
+        self.overlay = overlay
+        self.sidecar = sidecar
+        self.use_mmap = use_mmap
+        self.base_map = None
+        # Файл, в который при выходе сохраняется JSON-трасса замеров
+        self.trace_file = trace_file
+        # Завершилась ли последняя команда ошибкой
+        self.failed = False
+        self.profiler = CommandProfiler(keep_records=trace_file is not None)
+        # Центральный каталог читается один раз, дальше индекс обновляется по мере изменений
+        with self.profiler.command("init"):
+            if not os.path.exists(self.zip_file):
+                # Как и при открытии в режиме 'a', отсутствующий архив создаётся пустым
+                with self.profiler.phase("open"), ZipFile(self.zip_file, 'w'):
+                    pass
+            if session or overlay:
+                self.open_session()
+            else:
+                with self.profiler.phase("open"):
+                    myzip = ZipFile(self.zip_file, 'r')
+                with myzip, self.profiler.phase("index"):
+                    self.index = ArchiveIndex(myzip.infolist())
+            if overlay and sidecar and os.path.isfile(sidecar):
+                self.load_sidecar()
+
+    def open_base(self):
+        with self.profiler.phase("open"):
+            if self.use_mmap:
+                self.base_map = MappedFile(self.zip_file)
+                self.handle = ZipFile(self.base_map, 'r')
+            else:
+                self.handle = ZipFile(self.zip_file, 'r')
+
+    def close_base(self):
+        self.handle.close()
+        if self.base_map is not None:
+            self.base_map.close()
+            self.base_map = None
+
+    # Режим сессии: один открытый дескриптор, новые записи копятся в памяти до sync/exit
+    def open_session(self):
+        if self.handle is None:
+            self.open_base()
+            with self.profiler.phase("index"):
+                self.index = ArchiveIndex(self.handle.infolist())
+
+    def load_sidecar(self):
+        with self.profiler.phase("open"), ZipFile(self.sidecar, 'r') as myzip:
+            for info in myzip.infolist():
+                self.pending[info.filename] = (info, myzip.read(info))
+        with self.profiler.phase("index"):
+            for info, data in self.pending.values():
+                self.index.add(info)
+
+    def write_pending(self, myzip):
+        for info, data in self.pending.values():
+            myzip.writestr(info, data)
+
+    def sync(self):
+        if not self.pending:
+            return
+        with self.profiler.command("sync"):
+            if self.overlay:
+                # В режиме overlay базовый архив не трогаем, сохраняем только слой изменений
+                if self.sidecar:
+                    with self.profiler.phase("flush"):
+                        write_atomically(self.sidecar, self.write_sidecar)
+                return
+
+            if self.handle is not None:
+                self.close_base()
+            try:
+                with self.profiler.phase("flush"):
+                    write_atomically(self.zip_file, self.append_pending)
+            finally:
+                if self.handle is not None:
+                    self.open_base()
+            self.pending = {}
+
+    def append_pending(self, tmp_path):
+        with open(tmp_path, 'wb') as tmp_file, open(self.zip_file, 'rb') as src_file:
+            shutil.copyfileobj(src_file, tmp_file)
+        with ZipFile(tmp_path, 'a') as myzip:
+            self.write_pending(myzip)
+
+    def write_sidecar(self, tmp_path):
+        with ZipFile(tmp_path, 'w') as myzip:
+            self.write_pending(myzip)
+
+    # Записывает базовый архив вместе со слоем overlay в новый архив за один проход
+    def commit(self, target=None):
+        target = target or self.zip_file
+
+        def write(tmp_path):
+            with ZipFile(tmp_path, 'w') as myzip:
+                for info in self.handle.infolist():
+                    if info.filename in self.pending:
+                        continue
+                    copy = ZipInfo(info.filename, info.date_time)
+                    copy.compress_type = info.compress_type
+                    copy.external_attr = info.external_attr
+                    copy.comment = info.comment
+                    if info.is_dir():
+                        myzip.writestr(copy, b"")
+                        continue
+                    copy.file_size = info.file_size
+                    with self.handle.open(info) as src, myzip.open(copy, 'w') as dst:
+                        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                self.write_pending(myzip)
+
+        in_place = os.path.abspath(target) == os.path.abspath(self.zip_file)
+        base_closed = False
+
+        def release_base():
+            # Новый архив уже записан: закрываем базовый (и его отображение) перед заменой
+            nonlocal base_closed
+            self.close_base()
+            base_closed = True
+
+        with self.profiler.command("commit"):
+            try:
+                with self.profiler.phase("flush"):
+                    write_atomically(target, write, release_base if in_place else None)
+            finally:
+                if base_closed:
+                    self.open_base()
+            if in_place:
+                # Слой влит в базовый архив: перестраиваем индекс и очищаем overlay
+                with self.profiler.phase("index"):
+                    self.index = ArchiveIndex(self.handle.infolist())
+                self.pending = {}
+                if self.sidecar and os.path.isfile(self.sidecar):
+                    os.remove(self.sidecar)
+
+    def close(self):
+        self.sync()
+        if self.handle is not None:
+            self.close_base()
+            self.handle = None
+        if self.trace_file:
+            self.profiler.dump(self.trace_file)
 
     def get_current_path(self):
         return "/".join(self.path) + "/"
 
-    def run(self, command):
-        output = []
+    # Путь относительно текущего каталога, либо от корня, если начинается с /
+    def resolve(self, path):
+        parts = [part for part in ArchiveIndex.split_path(path) if part != "."]
+        return parts if path.startswith("/") else self.path + parts
+
+    # Открывает запись архива на чтение без распаковки целиком
+    @contextmanager
+    def open_member(self, info):
+        if info.filename in self.pending:
+            yield io.BytesIO(self.pending[info.filename][1])
+        elif self.handle is not None:
+            with self.handle.open(info) as member:
+                yield member
+        else:
+            with self.profiler.phase("open"):
+                myzip = ZipFile(self.zip_file, 'r')
+            with myzip, myzip.open(info) as member:
+                yield member
+
+    def iter_chunks(self, info):
+        with self.open_member(info) as member:
+            while True:
+                chunk = member.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def iter_lines(self, info):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        # Части ещё не законченной строки склеиваются один раз, когда придёт перевод строки:
+        # иначе длинная строка копировалась бы заново на каждом блоке
+        pieces = []
+        for chunk in self.iter_chunks(info):
+            text = decoder.decode(chunk)
+            if "\n" not in text:
+                pieces.append(text)
+                continue
+            lines = text.split("\n")
+            if pieces:
+                pieces.append(lines[0])
+                lines[0] = "".join(pieces)
+            pieces = [lines.pop()]
+            yield from lines
+        pieces.append(decoder.decode(b"", final=True))
+        tail = "".join(pieces)
+        if tail:
+            yield tail
+
+    @staticmethod
+    def format_size(size, human):
+        if not human:
+            return str(size)
+        for unit in ("", "K", "M", "G", "T"):
+            if size < 1024 or unit == "T":
+                return f"{size}{unit}" if unit == "" else f"{size:.1f}{unit}"
+            size /= 1024
+
+    # du [-s] [-h] [-z] [путь]: размеры из агрегатов индекса, -z — сжатые размеры
+    def du_command(self, args, output):
+        # Короткие флаги можно объединять: -sh — то же, что -s -h
+        flags = set()
+        for arg in args:
+            if arg.startswith("-"):
+                if len(arg) == 1 or not set(arg[1:]) <= set(DU_FLAGS):
+                    self.fail(output, f"du: неизвестный флаг: {arg}")
+                    return
+                flags.update(arg[1:])
+        targets = [arg for arg in args if not arg.startswith("-")] or ["."]
+        human = "h" in flags
+        compressed = "z" in flags
+
+        def entry_size(entry):
+            if isinstance(entry, DirectoryNode):
+                return entry.compressed_size if compressed else entry.size
+            return entry.compress_size if compressed else entry.file_size
+
+        def walk(node, label):
+            # Обход в обратном порядке, как у du: подкаталоги перед родителем.
+            # Явный стек вместо рекурсии: глубина архива не ограничена стеком интерпретатора
+            stack = [(node, label, iter(node.entries.items()))]
+            while stack:
+                node, label, entries = stack[-1]
+                for name, entry in entries:
+                    if isinstance(entry, DirectoryNode):
+                        stack.append((entry, f"{label}/{name}", iter(entry.entries.items())))
+                        break
+                else:
+                    stack.pop()
+                    output.append(f"{self.format_size(entry_size(node), human)}\t{label}")
+
+        for target in targets:
+            entry = self.index.get_entry(self.resolve(target))
+            if entry is None:
+                self.fail(output, f"Путь {target} не найден.")
+            elif "s" in flags or not isinstance(entry, DirectoryNode):
+                output.append(f"{self.format_size(entry_size(entry), human)}\t{target}")
+            else:
+                walk(entry, target.rstrip("/") or "/")
+
+    # tree [-L n] [-h] [путь]: дерево каталога с размерами из агрегатов
+    def tree_command(self, args, output):
+        depth = None
+        human = "-h" in args
+        args = [arg for arg in args if arg != "-h"]
+        if len(args) > 1 and args[0] == "-L":
+            if not args[1].isdigit() or int(args[1]) < 1:
+                self.fail(output, f"tree: неверная глубина: {args[1]}")
+                return
+            depth = int(args[1])
+            args = args[2:]
+        target = args[0] if args else "."
+        node = self.index.get_entry(self.resolve(target))
+        if not isinstance(node, DirectoryNode):
+            self.fail(output, f"Каталог {target} не найден.")
+            return
+
+        counts = [0, 0]
+
+        def walk(node, prefix, level):
+            # Явный стек вместо рекурсии: (префикс строк, уровень, оставшиеся записи, число записей)
+            stack = [(prefix, level, enumerate(node.entries.items()), len(node.entries))]
+            while stack:
+                prefix, level, items, count = stack[-1]
+                for i, (name, entry) in items:
+                    last = i == count - 1
+                    if isinstance(entry, DirectoryNode):
+                        counts[0] += 1
+                        size = entry.size
+                    else:
+                        counts[1] += 1
+                        size = entry.file_size
+                    output.append(f"{prefix}{'└── ' if last else '├── '}[{self.format_size(size, human)}]  {name}")
+                    if isinstance(entry, DirectoryNode) and (depth is None or level < depth):
+                        stack.append((prefix + ("    " if last else "│   "), level + 1,
+                                      enumerate(entry.entries.items()), len(entry.entries)))
+                        break
+                else:
+                    stack.pop()
+
+        output.append(target)
+        walk(node, "", 1)
+        output.append(f"{counts[0]} каталогов, {counts[1]} файлов")
+
+    def read_file_command(self, command, output):
+        parts = command.split()
+        name = parts[0]
+        count = 10
+        args = parts[1:]
+        if name in ("head", "tail") and len(args) > 1 and args[0] == "-n":
+            if not args[1].isdigit():
+                self.fail(output, f"{name}: неверное число строк: {args[1]}")
+                return
+            count = int(args[1])
+            args = args[2:]
+        if not args:
+            self.fail(output, f"{name}: не указан файл.")
+            return
+
+        for filename in args:
+            info = self.index.get_entry(self.resolve(filename))
+            if info is None:
+                self.fail(output, f"Файл {filename} не найден.")
+            elif isinstance(info, DirectoryNode):
+                self.fail(output, f"{filename} является каталогом.")
+            elif name == "cat":
+                # Строки уходят в вывод по одной, файл целиком в памяти не собирается
+                output.extend(self.iter_lines(info))
+            elif name == "head":
+                output.extend(islice(self.iter_lines(info), count))
+            elif name == "tail":
+                # Кольцевой буфер хранит только последние count строк
+                output.extend(deque(self.iter_lines(info), maxlen=count))
+            else:
+                lines = words = size = 0
+                in_word = False
+                for chunk in self.iter_chunks(info):
+                    lines += chunk.count(b"\n")
+                    size += len(chunk)
+                    chunk_words = WORD.findall(chunk)
+                    words += len(chunk_words)
+                    # Слово, разрезанное границей блока, не считаем дважды
+                    if in_word and not chunk[:1].isspace() and chunk_words:
+                        words -= 1
+                    in_word = not chunk[-1:].isspace()
+                output.append(f"{lines} {words} {size} {filename}")
+
+    # Выполняет команду с замером времени; префикс time добавляет замер к выводу
+    # output — список или ConsoleOutput, в который команда пишет строки вывода по мере их появления
+    def run(self, command, output=None):
+        if output is None:
+            output = []
+        self.failed = False
+        if command.startswith("time "):
+            self.run(command[5:].strip(), output)
+            output.append(self.profiler.format_record(self.profiler.last))
+            return output
+        with self.profiler.command(command):
+            self.execute(command, output)
+        return output
 
-        with ZipFile(self.zip_file, 'a') as myzip:
-            if command == "ls":
-                current_dir_files = []
-                for name in myzip.namelist():
-                    np = name.strip('/').split('/')
-                    last = np.pop()
-                    if self.path == np:
-                        current_dir_files.append(last)
-                output.append("  ".join(current_dir_files))
-
-            elif command.startswith("cd "):
-                parts = command.split(" ")
-                new_path = parts[1].split("/")
-                self.path = [i for i in new_path if i != ""]
-
-            elif command.startswith("touch "):
-                parts = command.split(" ")
-                filename = parts[1]
-                file_path = self.get_current_path() + filename
-                if file_path not in myzip.namelist():
-                    info = ZipInfo(file_path)
-                    myzip.writestr(info, "")
+    # Сообщение об ошибке идёт в вывод вместе с остальными строками и отмечает команду как неудачную
+    def fail(self, output, message):
+        self.failed = True
+        output.append(message)
+
+    def execute(self, command, output):
+
+        if command == "ls":
+            node = self.index.get_dir(self.path)
+            output.append("  ".join(node.entries) if node is not None else "")
+
+        elif command.startswith("cd "):
+            parts = command.split(" ")
+            new_path = self.resolve(parts[1])
+            if self.index.get_dir(new_path) is not None:
+                self.path = new_path
+            else:
+                self.fail(output, f"Каталог {parts[1]} не найден.")
+
+        elif command.startswith("touch "):
+            parts = command.split(" ")
+            filename = parts[1]
+            file_path = self.get_current_path() + filename
+            if not self.index.contains(file_path):
+                info = ZipInfo(file_path)
+                if self.handle is not None:
+                    self.pending[info.filename] = (info, b"")
                 else:
-                    output.append(f"Файл {filename} уже существует.")
-
-            elif command.startswith("find "):
-                parts = command.split(" ")
-                filename = parts[1]
-                found_files = []
-                found = False
-                for name in myzip.namelist():
-                    if name.endswith(filename):
-                        found_files.append(name)
-                        found = True
-                if not found:
-                    output.append(f"Файл {filename} не найден.")
+                    with self.profiler.phase("open"):
+                        myzip = ZipFile(self.zip_file, 'a')
+                    with self.profiler.phase("flush"), myzip:
+                        myzip.writestr(info, "")
+                with self.profiler.phase("index"):
+                    self.index.add(info)
+            else:
+                self.fail(output, f"Файл {filename} уже существует.")
+
+        elif command.startswith("find "):
+            parts = command.split()
+            filename = parts[-1]
+            scope = []
+            if len(parts) > 2:
+                scope = self.resolve(parts[1])
+            if scope and self.index.get_dir(scope) is None:
+                self.fail(output, f"Каталог {parts[1]} не найден.")
+            else:
+                found_files = self.index.find(filename, scope)
+                if not found_files:
+                    self.fail(output, f"Файл {filename} не найден.")
                 else:
                     output.append("\n".join(found_files))
 
+        elif command.split(" ", 1)[0] in ("cat", "head", "tail", "wc"):
+            self.read_file_command(command, output)
+
+        elif command == "du" or command.startswith("du "):
+            self.du_command(command.split()[1:], output)
+
+        elif command == "tree" or command.startswith("tree "):
+            self.tree_command(command.split()[1:], output)
+
+        elif command == "stats":
+            output.extend(self.profiler.report())
+
+        elif command == "sync":
+            self.sync()
+
+        elif command == "commit" or command.startswith("commit "):
+            if not self.overlay:
+                self.fail(output, "Команда commit доступна только в режиме overlay.")
+            else:
+                parts = command.split()
+                self.commit(parts[1] if len(parts) > 1 else None)
+
         return output
 
     def exit(self):
+        self.close()
         return "exit"
 
 # Чтение конфигурационного файла
@@ -63,6 +751,7 @@ def load_config(config_file="config.toml"):
         config = toml.load(config_file)
         settings = config['settings']
         computer_name = settings['computer_name']
+        # zip_file может быть путём к одному архиву или списком путей
         zip_file_path = settings['zip_file']
         startup_script = settings.get('startup_script')
         return computer_name, zip_file_path, startup_script
@@ -70,49 +759,152 @@ def load_config(config_file="config.toml"):
         print(f"Ошибка при чтении конфигурации: {e}")
         return None, None, None
 
+# Чтение стартового скрипта целиком в список команд
+def read_startup_script(startup_script):
+    with open(startup_script, 'r') as script_file:
+        return [line.strip() for line in script_file if line.strip()]
+
+# Пакетное выполнение: одна сессия архива, все изменения записываются одним сбросом в конце;
+# вывод и ошибки каждой команды сохраняются в порядке выполнения
+def run_batch(commands, emulator):
+    start = time.perf_counter()
+    counts = Counter()
+    results = []
+    emulator.open_session()
+    for command in commands:
+        counts[command.split(" ", 1)[0]] += 1
+        output = []
+        try:
+            emulator.run(command, output)
+            failed = emulator.failed
+        except Exception as e:
+            output.append(f"Ошибка: {type(e).__name__}: {e}")
+            failed = True
+        results.append({"command": command, "output": output, "failed": failed})
+    emulator.sync()
+    return {
+        "commands": len(commands),
+        "counts": dict(counts),
+        "results": results,
+        "failed": sum(result["failed"] for result in results),
+        "elapsed": time.perf_counter() - start,
+    }
+
+def print_batch_report(report):
+    for result in report["results"]:
+        if result["output"]:
+            print("\n".join(result["output"]))
+    print(f"Выполнено команд: {report['commands']} за {report['elapsed']:.3f} с")
+    for name, count in sorted(report["counts"].items()):
+        print(f"  {name}: {count}")
+    if report["failed"]:
+        print(f"Команд с ошибками: {report['failed']}")
+
+# Выполнение скрипта над одним архивом в отдельном процессе
+def run_archive(zip_file, commands):
+    result = {"zip_file": zip_file, "outputs": [], "error": None}
+    try:
+        emulator = ZipEmulator(zip_file, session=True)
+        try:
+            for command in commands:
+                output = emulator.run(command)
+                if output:
+                    result["outputs"].extend(output)
+        finally:
+            emulator.exit()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+# Параллельное выполнение одного скрипта над списком архивов;
+# результаты возвращаются в порядке списка независимо от порядка завершения
+def run_parallel(commands, zip_files, workers=None):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_archive, zip_files, [commands] * len(zip_files)))
+
+def print_parallel_results(results):
+    for result in results:
+        print(f"== {result['zip_file']} ==")
+        if result["error"]:
+            print(f"Ошибка: {result['error']}")
+        elif result["outputs"]:
+            print("\n".join(result["outputs"]))
+
 # Выполнение команд из стартового скрипта
-def execute_startup_script(startup_script, emulator):
+def execute_startup_script(startup_script, emulator, batch=False):
     if startup_script and os.path.isfile(startup_script):
+        if batch:
+            report = run_batch(read_startup_script(startup_script), emulator)
+            print_batch_report(report)
+            return report
         print(f"Выполнение стартового скрипта: {startup_script}")
-        with open(startup_script, 'r') as script_file:
-            commands = script_file.readlines()
-            for command in commands:
-                command = command.strip()
-                if command:
-                    print(f"Выполнение команды: {command}")
-                    result = emulator.run(command)
-                    if result:
-                        print("\n".join(result))
+        for command in read_startup_script(startup_script):
+            print(f"Выполнение команды: {command}")
+            emulator.run(command, ConsoleOutput())
     else:
         print("Стартовый скрипт не найден или не указан.")
 
 # Основной цикл программы
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Эмулятор оболочки поверх zip-архива.")
+    arg_parser.add_argument("-c", "--config", default="config.toml", help="Путь к конфигурационному файлу.")
+    arg_parser.add_argument("-b", "--batch", action="store_true",
+                            help="Выполнить стартовый скрипт в пакетном режиме и завершить работу.")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="Число процессов при работе со списком архивов.")
+    arg_parser.add_argument("-t", "--trace", default=None,
+                            help="Сохранить при выходе JSON-трассу замеров команд в указанный файл.")
+    arg_parser.add_argument("-o", "--overlay", action="store_true",
+                            help="Не изменять архив: изменения хранятся в слое overlay до команды commit.")
+    arg_parser.add_argument("--sidecar", default=None,
+                            help="Файл-спутник для сохранения слоя overlay между запусками.")
+    arg_parser.add_argument("--mmap", action="store_true", help="Отображать базовый архив в память.")
+    arg_parser.add_argument("--no-session", action="store_true",
+                            help="Записывать изменения в архив сразу после каждой команды, а не при выходе.")
+    args = arg_parser.parse_args()
+
     # Загружаем параметры из конфигурационного файла
-    default_computer_name, zip_file_path, startup_script = load_config()
+    default_computer_name, zip_file_path, startup_script = load_config(args.config)
 
     if not zip_file_path:
         print("Ошибка загрузки конфигурационного файла. Завершение работы.")
+    elif isinstance(zip_file_path, list):
+        # Список архивов: стартовый скрипт выполняется над каждым параллельно
+        if not startup_script or not os.path.isfile(startup_script):
+            print("Стартовый скрипт не найден или не указан.")
+            sys.exit(1)
+        results = run_parallel(read_startup_script(startup_script), zip_file_path, args.jobs)
+        print_parallel_results(results)
+        sys.exit(1 if any(result["error"] for result in results) else 0)
+    elif args.batch:
+        emulator = ZipEmulator(zip_file_path, session=True, trace_file=args.trace, overlay=args.overlay,
+                               sidecar=args.sidecar, use_mmap=args.mmap)
+        report = execute_startup_script(startup_script, emulator, batch=True)
+        emulator.exit()
+        sys.exit(0 if report is not None and not report["failed"] else 1)
     else:
-        emulator = ZipEmulator(zip_file_path)
+        emulator = ZipEmulator(zip_file_path, session=not args.no_session, trace_file=args.trace,
+                               overlay=args.overlay, sidecar=args.sidecar, use_mmap=args.mmap)
+        # Отложенные изменения сессии сбрасываются в архив при любом завершении: exit, Ctrl-C или конец ввода
+        try:
+            # Выполняем стартовый скрипт, если он есть
+            execute_startup_script(startup_script, emulator)
 
-        # Выполняем стартовый скрипт, если он есть
-        execute_startup_script(startup_script, emulator)
+            # Запрашиваем у пользователя имя компьютера
+            computer_name = input(f"Введите имя компьютера (по умолчанию: {default_computer_name}): ")
 
-        # Запрашиваем у пользователя имя компьютера
-        computer_name = input(f"Введите имя компьютера (по умолчанию: {default_computer_name}): ")
-
-        # Если пользователь не ввел имя, используем значение по умолчанию
-        if not computer_name.strip():
-            computer_name = default_computer_name
-
-        while True:
-            # Ввод команды с отображением имени компьютера
-            command = input(f"{computer_name}$ ")  # Имя компьютера в приглашении
-            if command == "exit":
-                print("Завершение работы.")
-                break
+            # Если пользователь не ввел имя, используем значение по умолчанию
+            if not computer_name.strip():
+                computer_name = default_computer_name
 
-            result = emulator.run(command)
-            if result:
-                print("\n".join(result))
+            while True:
+                # Ввод команды с отображением имени компьютера
+                command = input(f"{computer_name}$ ")  # Имя компьютера в приглашении
+                if command == "exit":
+                    break
+                emulator.run(command, ConsoleOutput())
+        except (EOFError, KeyboardInterrupt):
+            print()
+        finally:
+            emulator.exit()
+        print("Завершение работы.")
@@ -0,0 +1,145 @@
+import os
+import io
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from zipfile import ZipFile, ZipInfo, ZIP_STORED
+from Emulator import ZipEmulator, execute_startup_script
+
+# Глубина и ширина ветвления для «глубокого» дерева
+DEEP_LEVELS = 6
+DEEP_FANOUT = 4
+
+
+# Путь i-й записи: плоское дерево — всё в корне, глубокое — DEEP_LEVELS уровней каталогов
+def entry_name(i, layout):
+    if layout == "flat":
+        return f"file{i}.txt"
+    dirs = []
+    n = i
+    for _ in range(DEEP_LEVELS):
+        dirs.append(f"d{n % DEEP_FANOUT}")
+        n //= DEEP_FANOUT
+    return "/".join(dirs) + f"/file{i}.txt"
+
+
+# Создание синтетического архива из пустых записей
+def generate_archive(path, entries, layout):
+    with ZipFile(path, 'w', ZIP_STORED) as myzip:
+        for i in range(entries):
+            myzip.writestr(ZipInfo(entry_name(i, layout)), b"")
+
+
+def sample_dirs(entries, layout, count):
+    if layout == "flat":
+        return ["/"] * count
+    step = max(entries // count, 1)
+    return ["/" + entry_name(i * step % entries, layout).rsplit("/", 1)[0] for i in range(count)]
+
+
+def sample_names(entries, layout, count):
+    step = max(entries // count, 1)
+    return [entry_name(i * step % entries, layout).rsplit("/", 1)[-1] for i in range(count)]
+
+
+# Нагрузки: выполняют команды в открытой сессии и возвращают их число
+def workload_ls(emulator, entries, layout, ops):
+    for directory in sample_dirs(entries, layout, ops):
+        emulator.run(f"cd {directory}")
+        emulator.run("ls")
+    return ops * 2
+
+
+def workload_cd(emulator, entries, layout, ops):
+    for directory in sample_dirs(entries, layout, ops):
+        emulator.run(f"cd {directory}")
+    return ops
+
+
+def workload_touch(emulator, entries, layout, ops):
+    for i in range(ops):
+        emulator.run(f"touch new{i}.txt")
+    return ops
+
+
+def workload_find(emulator, entries, layout, ops):
+    for name in sample_names(entries, layout, ops):
+        emulator.run(f"find {name}")
+    emulator.run("find file1*.txt")
+    return ops + 1
+
+
+def workload_script(emulator, entries, layout, ops):
+    script_path = emulator.zip_file + ".sh"
+    with open(script_path, 'w') as script_file:
+        for i in range(ops):
+            script_file.write(f"touch script{i}.txt\n")
+        script_file.write("ls\n")
+    with redirect_stdout(io.StringIO()):
+        execute_startup_script(script_path, emulator, batch=True)
+    return ops + 1
+
+
+WORKLOADS = {
+    "ls": workload_ls,
+    "cd": workload_cd,
+    "touch": workload_touch,
+    "find": workload_find,
+    "script": workload_script,
+}
+
+
+# Замер одной нагрузки на отдельной копии архива: время открытия, время и пропускная
+# способность команд (включая итоговую запись) и пик памяти
+def measure(workload, base_archive, work_dir, entries, layout, ops, track_memory):
+    zip_file = os.path.join(work_dir, "work.zip")
+    shutil.copyfile(base_archive, zip_file)
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    emulator = ZipEmulator(zip_file, session=True)
+    opened = time.perf_counter()
+    commands = workload(emulator, entries, layout, ops)
+    emulator.exit()
+    elapsed = time.perf_counter() - opened
+    peak = 0
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"commands": commands, "startup": opened - start, "elapsed": elapsed,
+            "throughput": commands / elapsed if elapsed else 0.0, "peak": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк ZipEmulator на синтетических архивах.")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=[10_000, 100_000],
+                        help="Число записей в архивах (например, 10000 100000 1000000).")
+    parser.add_argument("-l", "--layouts", nargs="+", choices=["flat", "deep"], default=["flat", "deep"],
+                        help="Форма дерева каталогов.")
+    parser.add_argument("-w", "--workloads", nargs="+", choices=sorted(WORKLOADS), default=list(WORKLOADS),
+                        help="Набор нагрузок.")
+    parser.add_argument("-n", "--ops", type=int, default=1000, help="Число команд в каждой нагрузке.")
+    parser.add_argument("--no-memory", action="store_true", help="Не измерять пик памяти (tracemalloc замедляет работу).")
+    args = parser.parse_args()
+
+    print(f"{'записей':>9} {'дерево':>6} {'нагрузка':>8} {'открытие, с':>11} "
+          f"{'команд':>7} {'время, с':>9} {'ком/с':>10} {'пик, МБ':>8}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for entries in args.sizes:
+            for layout in args.layouts:
+                base_archive = os.path.join(work_dir, f"base_{layout}_{entries}.zip")
+                generate_archive(base_archive, entries, layout)
+                for name in args.workloads:
+                    result = measure(WORKLOADS[name], base_archive, work_dir, entries, layout,
+                                     args.ops, not args.no_memory)
+                    print(f"{entries:>9} {layout:>6} {name:>8} {result['startup']:>11.3f} {result['commands']:>7} "
+                          f"{result['elapsed']:>9.3f} {result['throughput']:>10.0f} "
+                          f"{result['peak'] / 2 ** 20:>8.1f}")
+                os.remove(base_archive)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 import unittest
 import os
+import sys
+import json
 import tempfile
+import subprocess
+from unittest import mock
 from zipfile import ZipFile
-from Emulator import ZipEmulator  # Импортируем эмулятор из основной программы
+from Emulator import ZipEmulator, run_batch, execute_startup_script, run_parallel  # Импортируем эмулятор из основной программы
 
 class TestZipEmulator(unittest.TestCase):
 
@@ -66,5 +70,419 @@ class TestZipEmulator(unittest.TestCase):
         output = self.emulator.run("find missing.txt")
         self.assertIn("Файл missing.txt не найден.", output[0])
 
+    def test_cd_nonexistent_reports_error(self):
+        # Тест сообщения об ошибке при переходе в несуществующий каталог
+        output = self.emulator.run("cd nonexistent")
+        self.assertIn("Каталог nonexistent не найден.", output)
+        self.assertEqual(self.emulator.path, [])
+
+    def test_ls_lists_only_current_directory(self):
+        # Тест того, что ls показывает только содержимое текущего каталога
+        self.emulator.run("touch root.txt")
+        self.emulator.run("touch folder1/inner.txt")
+        self.emulator.run("cd folder1")
+        output = self.emulator.run("ls")
+        self.assertEqual(output, ["inner.txt"])
+
+    def test_index_built_from_existing_archive(self):
+        # Тест построения индекса по уже существующим записям архива
+        with ZipFile(self.zip_file_path, 'w') as myzip:
+            myzip.writestr("a/b/c.txt", "")
+            myzip.writestr("a/d.txt", "")
+        emulator = ZipEmulator(self.zip_file_path)
+        self.assertEqual(emulator.run("cd a/b"), [])
+        self.assertEqual(emulator.run("ls"), ["c.txt"])
+        emulator.run("cd /a")
+        self.assertEqual(emulator.run("ls"), ["b  d.txt"])
+
+    def test_missing_archive_created(self):
+        # Тест запуска с ещё не существующим архивом: он создаётся пустым
+        missing = os.path.join(self.temp_dir.name, "new", "files.zip")
+        os.mkdir(os.path.dirname(missing))
+        for session in (False, True):
+            emulator = ZipEmulator(missing, session=session)
+            emulator.run("touch a.txt" if not session else "touch b.txt")
+            emulator.exit()
+        with ZipFile(missing, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["/a.txt", "/b.txt"])
+
+    def test_cd_relative_to_current(self):
+        # Тест cd: путь без / задаётся относительно текущего каталога
+        self.emulator.run("touch a/sub/file.txt")
+        self.emulator.run("touch sub/other.txt")
+        self.emulator.run("cd a")
+        self.assertEqual(self.emulator.run("cd sub"), [])
+        self.assertEqual(self.emulator.path, ["a", "sub"])
+        self.assertEqual(self.emulator.run("ls"), ["file.txt"])
+        self.assertEqual(self.emulator.run("cd /sub"), [])
+        self.assertEqual(self.emulator.run("ls"), ["other.txt"])
+        self.assertIn("Каталог a не найден.", self.emulator.run("cd a"))
+        self.assertEqual(self.emulator.path, ["sub"])
+
+    def test_session_defers_writes_until_sync(self):
+        # Тест отложенной записи в режиме сессии
+        emulator = ZipEmulator(self.zip_file_path, session=True)
+        emulator.run("touch a.txt")
+        emulator.run("touch dir/b.txt")
+        self.assertIn("a.txt", emulator.run("ls")[0])
+        with ZipFile(self.zip_file_path, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), [])
+
+        emulator.run("sync")
+        with ZipFile(self.zip_file_path, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["/a.txt", "/dir/b.txt"])
+        self.assertEqual(emulator.pending, {})
+        emulator.exit()
+
+    def test_session_exit_flushes_without_temp_files(self):
+        # Тест сброса изменений при выходе и отсутствия временных файлов
+        emulator = ZipEmulator(self.zip_file_path, session=True)
+        emulator.run("touch a.txt")
+        self.assertEqual(emulator.exit(), "exit")
+        with ZipFile(self.zip_file_path, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["/a.txt"])
+        self.assertEqual(os.listdir(self.temp_dir.name), ["test_files.zip"])
+
+    def test_find_suffix_and_glob(self):
+        # Тест поиска по окончанию имени и по шаблонам * и ?
+        self.emulator.run("touch folder1/file3.txt")
+        self.emulator.run("touch folder2/file4.py")
+        self.emulator.run("touch notes.txt")
+        self.assertEqual(self.emulator.run("find 3.txt"), ["/folder1/file3.txt"])
+        self.assertEqual(self.emulator.run("find r1/file3.txt"), ["/folder1/file3.txt"])
+        self.assertEqual(self.emulator.run("find *.txt"), ["/folder1/file3.txt\n/notes.txt"])
+        self.assertEqual(self.emulator.run("find file?.py"), ["/folder2/file4.py"])
+        self.assertIn("Файл *.md не найден.", self.emulator.run("find *.md"))
+
+    def test_find_bracket_classes(self):
+        # Тест шаблонов с классами символов: тело класса не считается буквальным фрагментом
+        for name in ("file1.txt", "file2.txt", "file3.txt", "report_a.txt", "report_c.txt", "x[1].txt"):
+            self.emulator.run(f"touch {name}")
+        self.assertEqual(self.emulator.run("find file[12].txt"), ["/file1.txt\n/file2.txt"])
+        self.assertEqual(self.emulator.run("find file[0-9].txt"), ["/file1.txt\n/file2.txt\n/file3.txt"])
+        self.assertEqual(self.emulator.run("find file[!12].txt"), ["/file3.txt"])
+        self.assertEqual(self.emulator.run("find report_[ab].txt"), ["/report_a.txt"])
+        # Незакрытая скобка — обычный символ
+        self.assertEqual(self.emulator.run("find x[1"), ["Файл x[1 не найден."])
+        self.assertEqual(self.emulator.run("find x[[]1].txt"), ["/x[1].txt"])
+
+    def test_find_in_directory(self):
+        # Тест поиска, ограниченного каталогом
+        self.emulator.run("touch folder1/file.txt")
+        self.emulator.run("touch folder2/file.txt")
+        self.assertEqual(self.emulator.run("find folder2 file.txt"), ["/folder2/file.txt"])
+        self.emulator.run("cd folder1")
+        self.assertEqual(self.emulator.run("find . *.txt"), ["/folder1/file.txt"])
+        # Каталог поиска, как и в cat/du/tree, задаётся относительно текущего
+        self.emulator.run("touch sub/file.txt")
+        self.assertEqual(self.emulator.run("find sub file.txt"), ["folder1/sub/file.txt"])
+        self.assertEqual(self.emulator.run("find /folder2 file.txt"), ["/folder2/file.txt"])
+        self.assertIn("Каталог missing не найден.", self.emulator.run("find missing file.txt"))
+
+    def test_run_batch_reports_counts(self):
+        # Тест пакетного выполнения команд одной сессией
+        commands = ["touch a.txt", "touch dir/b.txt", "touch a.txt", "ls", "find b.txt"]
+        report = run_batch(commands, self.emulator)
+        self.assertEqual(report["commands"], 5)
+        self.assertEqual(report["counts"], {"touch": 3, "ls": 1, "find": 1})
+        self.assertEqual([result["output"] for result in report["results"]],
+                         [[], [], ["Файл a.txt уже существует."], ["a.txt  dir"], ["/dir/b.txt"]])
+        self.assertEqual([result["failed"] for result in report["results"]], [False, False, True, False, False])
+        self.assertEqual(report["failed"], 1)
+        with ZipFile(self.zip_file_path, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["/a.txt", "/dir/b.txt"])
+        self.emulator.exit()
+
+    def test_execute_startup_script_batch(self):
+        # Тест пакетного режима для стартового скрипта
+        script_path = os.path.join(self.temp_dir.name, "script.sh")
+        with open(script_path, 'w') as script_file:
+            script_file.write("touch one.txt\n\ntouch two.txt\nls\n")
+        report = execute_startup_script(script_path, self.emulator, batch=True)
+        self.assertEqual(report["commands"], 3)
+        self.assertEqual(self.emulator.run("ls"), ["one.txt  two.txt"])
+        self.emulator.exit()
+
+    def run_cli(self, commands, *options, stdin=""):
+        # Запуск Emulator.py со стартовым скриптом commands над временным архивом
+        script_path = os.path.join(self.temp_dir.name, "script.sh")
+        config_path = os.path.join(self.temp_dir.name, "config.toml")
+        with open(config_path, 'w') as config_file:
+            config_file.write(f'[settings]\ncomputer_name = "test"\nzip_file = "{self.zip_file_path}"\n'
+                              f'startup_script = "{script_path}"\n')
+        with open(script_path, 'w') as script_file:
+            script_file.write("\n".join(commands) + "\n")
+        emulator_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Emulator.py")
+        return subprocess.run([sys.executable, emulator_path, "-c", config_path, *options],
+                              input=stdin, capture_output=True, text=True)
+
+    def test_batch_cli_prints_outputs_and_fails(self):
+        # Тест запуска --batch: вывод команд печатается по порядку, ошибка даёт ненулевой код выхода
+        result = self.run_cli(["touch a.txt", "ls", "find a.txt"], "--batch")
+        self.assertEqual(result.returncode, 0)
+        self.assertTrue(result.stdout.startswith("a.txt\n/a.txt\nВыполнено команд: 3"))
+        result = self.run_cli(["cat missing.txt", "ls", "touch b.txt"], "--batch")
+        self.assertEqual(result.returncode, 1)
+        self.assertTrue(result.stdout.startswith("Файл missing.txt не найден.\na.txt\nВыполнено команд: 3"))
+        self.assertIn("Команд с ошибками: 1", result.stdout)
+        with ZipFile(self.zip_file_path, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["/a.txt", "/b.txt"])
+
+    def test_interactive_flushes_session_on_eof(self):
+        # Тест интерактивного режима: при конце ввода без exit отложенные изменения сохраняются
+        result = self.run_cli(["touch a.txt"], stdin="\ntouch b.txt\nls\n")
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("a.txt  b.txt", result.stdout)
+        self.assertTrue(result.stdout.endswith("Завершение работы.\n"))
+        with ZipFile(self.zip_file_path, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["/a.txt", "/b.txt"])
+        # --no-session: каждая команда сразу пишет в архив, сбрасывать при выходе нечего
+        trace_path = os.path.join(self.temp_dir.name, "trace.json")
+        result = self.run_cli(["touch c.txt"], "--no-session", "-t", trace_path, stdin="\nexit\n")
+        self.assertEqual(result.returncode, 0)
+        with open(trace_path) as trace_file:
+            self.assertEqual([record["command"] for record in json.load(trace_file)["records"]], ["init", "touch"])
+        with ZipFile(self.zip_file_path, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["/a.txt", "/b.txt", "/c.txt"])
+
+    def test_run_parallel_keeps_archive_order(self):
+        # Тест параллельного выполнения скрипта над несколькими архивами
+        zip_files = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir.name, f"archive{i}.zip")
+            with ZipFile(path, 'w') as myzip:
+                myzip.writestr(f"existing{i}.txt", "")
+            zip_files.append(path)
+        broken = os.path.join(self.temp_dir.name, "broken.zip")
+        with open(broken, 'w') as broken_file:
+            broken_file.write("not a zip archive")
+        zip_files.append(broken)
+
+        results = run_parallel(["touch new.txt", "ls"], zip_files, workers=2)
+        self.assertEqual([result["zip_file"] for result in results], zip_files)
+        for i in range(3):
+            self.assertIsNone(results[i]["error"])
+            self.assertEqual(results[i]["outputs"], [f"existing{i}.txt  new.txt"])
+        self.assertIn("BadZipFile", results[3]["error"])
+
+    def write_archive(self, files):
+        with ZipFile(self.zip_file_path, 'w') as myzip:
+            for name, content in files.items():
+                myzip.writestr(name, content)
+        return ZipEmulator(self.zip_file_path)
+
+    def test_cat_head_tail(self):
+        # Тест чтения содержимого файлов командами cat, head и tail
+        content = "".join(f"line{i}\n" for i in range(1, 21))
+        emulator = self.write_archive({"docs/log.txt": content})
+        emulator.run("cd docs")
+        self.assertEqual(emulator.run("cat log.txt"), [f"line{i}" for i in range(1, 21)])
+        self.assertEqual(emulator.run("head -n 2 log.txt"), ["line1", "line2"])
+        self.assertEqual(emulator.run("head log.txt"), [f"line{i}" for i in range(1, 11)])
+        self.assertEqual(emulator.run("tail -n 3 /docs/log.txt"), ["line18", "line19", "line20"])
+        self.assertIn("Файл missing.txt не найден.", emulator.run("cat missing.txt"))
+        emulator.run("cd /")
+        self.assertIn("docs является каталогом.", emulator.run("cat docs"))
+
+    def test_wc_across_chunks(self):
+        # Тест подсчёта строк, слов и байт при чтении по блокам
+        import Emulator
+        content = "alpha beta\ngamma  delta epsilon\nzeta"
+        emulator = self.write_archive({"text.txt": content})
+        chunk_size = Emulator.CHUNK_SIZE
+        Emulator.CHUNK_SIZE = 3
+        try:
+            output = emulator.run("wc text.txt")
+            lines = emulator.run("cat text.txt")
+        finally:
+            Emulator.CHUNK_SIZE = chunk_size
+        self.assertEqual(output, [f"2 6 {len(content)} text.txt"])
+        self.assertEqual(lines, ["alpha beta", "gamma  delta epsilon", "zeta"])
+
+    def test_cat_long_line_streams(self):
+        # Тест длинной строки, разрезанной на много блоков, и построчного вывода cat
+        import io
+        import Emulator
+        long_line = "ж" * 50000
+        emulator = self.write_archive({"big.txt": f"{long_line}\nshort\n{long_line}"})
+        chunk_size = Emulator.CHUNK_SIZE
+        Emulator.CHUNK_SIZE = 7
+        try:
+            stream = io.StringIO()
+            emulator.run("cat big.txt", Emulator.ConsoleOutput(stream))
+        finally:
+            Emulator.CHUNK_SIZE = chunk_size
+        self.assertEqual(stream.getvalue(), f"{long_line}\nshort\n{long_line}\n")
+        self.assertEqual(emulator.run("tail -n 2 big.txt"), ["short", long_line])
+
+    def test_cat_staged_file_in_session(self):
+        # Тест чтения ещё не записанного на диск файла в режиме сессии
+        emulator = ZipEmulator(self.zip_file_path, session=True)
+        emulator.run("touch empty.txt")
+        self.assertEqual(emulator.run("cat empty.txt"), [])
+        self.assertEqual(emulator.run("wc empty.txt"), ["0 0 0 empty.txt"])
+        emulator.exit()
+
+    def test_du_uses_directory_totals(self):
+        # Тест du по агрегированным размерам каталогов
+        emulator = self.write_archive({"a/b/c.txt": "x" * 2048, "a/d.txt": "y" * 10, "e.txt": "hello"})
+        self.assertEqual(emulator.run("du"), ["2048\t./a/b", "2058\t./a", "2063\t."])
+        self.assertEqual(emulator.run("du -s a"), ["2058\ta"])
+        self.assertEqual(emulator.run("du -s -h a/b"), ["2.0K\ta/b"])
+        self.assertEqual(emulator.run("du e.txt"), ["5\te.txt"])
+        # Объединённые флаги и неизвестные флаги
+        self.assertEqual(emulator.run("du -sh a/b"), ["2.0K\ta/b"])
+        self.assertEqual(emulator.run("du -hs a"), ["2.0K\ta"])
+        self.assertEqual(emulator.run("du -sx a"), ["du: неизвестный флаг: -sx"])
+        self.assertTrue(emulator.failed)
+        self.assertEqual(emulator.run("du --summarize a"), ["du: неизвестный флаг: --summarize"])
+        self.assertIn("Путь missing не найден.", emulator.run("du missing"))
+
+    def test_du_updated_by_touch(self):
+        # Тест обновления агрегатов при создании файлов
+        self.emulator.run("touch dir/one.txt")
+        self.emulator.run("touch dir/two.txt")
+        node = self.emulator.index.get_dir(["dir"])
+        self.assertEqual(node.file_count, 2)
+        self.assertEqual(self.emulator.index.root.file_count, 2)
+
+    def test_tree_depth_limit(self):
+        # Тест вывода дерева с ограничением глубины
+        emulator = self.write_archive({"a/b/c.txt": "abc", "a/d.txt": "", "e.txt": "hello"})
+        self.assertEqual(emulator.run("tree -L 1"), [
+            ".",
+            "├── [3]  a",
+            "└── [5]  e.txt",
+            "1 каталогов, 1 файлов",
+        ])
+        self.assertEqual(emulator.run("tree a"), [
+            "a",
+            "├── [3]  b",
+            "│   └── [3]  c.txt",
+            "└── [0]  d.txt",
+            "1 каталогов, 2 файлов",
+        ])
+
+    def test_du_and_tree_deep_archive(self):
+        # Тест обхода каталогов глубже предела рекурсии интерпретатора
+        emulator = self.write_archive({"d/" * 1200 + "f.txt": "abc"})
+        du = emulator.run("du")
+        self.assertEqual(len(du), 1201)
+        self.assertEqual(du[-1], "3\t.")
+        tree = emulator.run("tree")
+        self.assertEqual(tree[-1], "1200 каталогов, 1 файлов")
+        self.assertTrue(tree[-2].endswith("└── [3]  f.txt"))
+
+    def test_time_prefix_reports_phases(self):
+        # Тест префикса time: вывод команды и строка с замером по фазам
+        output = self.emulator.run("time touch timed.txt")
+        self.assertEqual(len(output), 1)
+        self.assertRegex(output[0], r"^real \d+\.\d{3} мс \(open .+, index .+, operate .+, flush .+\)$")
+        record = self.emulator.profiler.last
+        self.assertEqual(record["command"], "touch")
+        self.assertGreater(record["phases"]["flush"], 0)
+        # Без файла трассы полные записи команд не накапливаются
+        self.assertEqual(self.emulator.profiler.records, [])
+
+    def test_stats_percentiles(self):
+        # Тест команды stats со статистикой по командам
+        for _ in range(5):
+            self.emulator.run("ls")
+        output = self.emulator.run("stats")
+        self.assertTrue(output[0].startswith("команда"))
+        ls_line = next(line for line in output if line.startswith("ls "))
+        self.assertEqual(ls_line.split()[1], "5")
+        self.assertTrue(any(line.startswith("init ") for line in output))
+        self.assertTrue(output[-1].startswith("фазы: open"))
+
+    def test_trace_file_written_on_exit(self):
+        # Тест сохранения JSON-трассы при выходе
+        trace_path = os.path.join(self.temp_dir.name, "trace.json")
+        emulator = ZipEmulator(self.zip_file_path, session=True, trace_file=trace_path)
+        emulator.run("touch a.txt")
+        emulator.exit()
+        with open(trace_path) as trace_file:
+            trace = json.load(trace_file)
+        commands = [record["command"] for record in trace["records"]]
+        self.assertEqual(commands, ["init", "touch", "sync"])
+        self.assertGreater(trace["records"][-1]["phases"]["flush"], 0)
+
+    def test_overlay_never_touches_base(self):
+        # Тест режима overlay: базовый архив не меняется до commit
+        self.write_archive({"base.txt": "base data"})
+        with open(self.zip_file_path, 'rb') as base_file:
+            original = base_file.read()
+        emulator = ZipEmulator(self.zip_file_path, overlay=True, use_mmap=True)
+        emulator.run("touch new.txt")
+        emulator.run("sync")
+        self.assertEqual(emulator.run("ls"), ["base.txt  new.txt"])
+        self.assertEqual(emulator.run("cat base.txt"), ["base data"])
+        self.assertEqual(emulator.run("find *.txt"), ["base.txt\n/new.txt"])
+        emulator.exit()
+        with open(self.zip_file_path, 'rb') as base_file:
+            self.assertEqual(base_file.read(), original)
+
+    def test_overlay_mmap_empty_archive(self):
+        # Тест отображения в память пустого архива
+        emulator = ZipEmulator(self.zip_file_path, overlay=True, use_mmap=True)
+        emulator.run("touch new.txt")
+        self.assertEqual(emulator.run("ls"), ["new.txt"])
+        emulator.exit()
+
+    def test_overlay_commit_to_new_archive(self):
+        # Тест записи базового архива и слоя overlay в новый архив
+        self.write_archive({"dir/base.txt": "base data"})
+        target = os.path.join(self.temp_dir.name, "merged.zip")
+        emulator = ZipEmulator(self.zip_file_path, overlay=True)
+        emulator.run("touch new.txt")
+        self.assertEqual(emulator.run(f"commit {target}"), [])
+        emulator.exit()
+        with ZipFile(target, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["dir/base.txt", "/new.txt"])
+            self.assertEqual(myzip.read("dir/base.txt"), b"base data")
+        with ZipFile(self.zip_file_path, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["dir/base.txt"])
+
+    def test_overlay_sidecar_and_commit_in_place(self):
+        # Тест сохранения слоя в файл-спутник и последующего commit в базовый архив
+        self.write_archive({"base.txt": "base data"})
+        sidecar = os.path.join(self.temp_dir.name, "overlay.zip")
+        emulator = ZipEmulator(self.zip_file_path, overlay=True, sidecar=sidecar)
+        emulator.run("touch new.txt")
+        emulator.exit()
+        self.assertTrue(os.path.isfile(sidecar))
+
+        emulator = ZipEmulator(self.zip_file_path, overlay=True, sidecar=sidecar)
+        self.assertEqual(emulator.run("ls"), ["base.txt  new.txt"])
+        emulator.run("commit")
+        self.assertFalse(os.path.exists(sidecar))
+        self.assertEqual(emulator.run("cat base.txt"), ["base data"])
+        emulator.exit()
+        with ZipFile(self.zip_file_path, 'r') as myzip:
+            self.assertEqual(myzip.namelist(), ["base.txt", "/new.txt"])
+
+    def test_commit_in_place_closes_base_before_replace(self):
+        # Тест: базовый архив (и его отображение в память) закрыт к моменту замены,
+        # иначе на Windows os.replace завершается PermissionError
+        self.write_archive({"base.txt": "base data"})
+        emulator = ZipEmulator(self.zip_file_path, overlay=True, use_mmap=True)
+        emulator.run("touch new.txt")
+        real_replace = os.replace
+        states = []
+
+        def checked_replace(src, dst):
+            states.append((emulator.handle.fp, emulator.base_map))
+            real_replace(src, dst)
+
+        with mock.patch("Emulator.os.replace", side_effect=checked_replace):
+            emulator.run("commit")
+        self.assertEqual(states, [(None, None)])
+        self.assertEqual(emulator.run("cat base.txt"), ["base data"])
+        emulator.exit()
+
+    def test_commit_requires_overlay(self):
+        # Тест сообщения о commit вне режима overlay
+        self.assertIn("Команда commit доступна только в режиме overlay.", self.emulator.run("commit"))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,243 @@
+import io
+import os
+import time
+import zlib
+import shutil
+import struct
+import hashlib
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from git_pack import OBJ_COMMIT, OBJ_TREE
+from git_dependency_graph import GitDependencyGraph
+
+# Пустое дерево: на него ссылаются все синтетические коммиты
+EMPTY_TREE = b""
+# Число параллельных веток для «широкой» топологии
+WIDE_BRANCHES = 64
+START_TIME = 1_600_000_000
+
+
+def object_sha(type_name, body):
+    return hashlib.sha1(type_name + b" %d\0" % len(body) + body).digest()
+
+
+def commit_body(tree, parents, i):
+    lines = [b"tree " + tree.hex().encode()]
+    lines += [b"parent " + parent.hex().encode() for parent in parents]
+    stamp = b"Bench <bench@example.com> %d +0000" % (START_TIME + i)
+    lines += [b"author " + stamp, b"committer " + stamp]
+    return b"\n".join(lines) + b"\n\ncommit %d\n" % i
+
+
+# Топологии: по числу коммитов выдают списки номеров родителей в порядке создания
+def topology_linear(count):
+    for i in range(count):
+        yield [i - 1] if i else []
+
+
+def topology_merge(count):
+    """Каждый второй коммит — слияние основной линии с коммитом побочной ветки."""
+    for i in range(count):
+        if i < 2:
+            yield [i - 1] if i else []
+        elif i % 2:
+            yield [i - 2, i - 1]  # слияние: предыдущий основной коммит и побочный
+        else:
+            yield [i - 1] if i == 2 else [i - 3]  # побочный коммит от предпоследнего основного
+
+
+def topology_wide(count):
+    """WIDE_BRANCHES веток от общего корня развиваются параллельно и сливаются одним octopus-коммитом."""
+    if count < 3:
+        yield from topology_linear(count)
+        return
+    width = min(WIDE_BRANCHES, count - 2)
+    body = count - 1
+    for i in range(body):
+        yield [i - width if i > width else 0] if i else []
+    yield list(range(body - width, body))
+
+
+TOPOLOGIES = {
+    "linear": topology_linear,
+    "merge": topology_merge,
+    "wide": topology_wide,
+}
+
+
+def generate_objects(topology, count):
+    """Выдаёт (тип, SHA, тело) объектов синтетической истории: пустое дерево и коммиты."""
+    tree = object_sha(b"tree", EMPTY_TREE)
+    yield OBJ_TREE, tree, EMPTY_TREE
+    shas = []
+    for i, parents in enumerate(TOPOLOGIES[topology](count)):
+        body = commit_body(tree, [shas[parent] for parent in parents], i)
+        sha = object_sha(b"commit", body)
+        shas.append(sha)
+        yield OBJ_COMMIT, sha, body
+
+
+def write_loose(objects_dir, obj_type, sha, body):
+    type_name = b"commit" if obj_type == OBJ_COMMIT else b"tree"
+    obj_dir = os.path.join(objects_dir, sha[:1].hex())
+    os.makedirs(obj_dir, exist_ok=True)
+    with open(os.path.join(obj_dir, sha[1:].hex()), "wb") as f:
+        f.write(zlib.compress(type_name + b" %d\0" % len(body) + body))
+
+
+def pack_entry_header(obj_type, size):
+    """Заголовок объекта в pack-файле: тип и размер в формате переменной длины."""
+    byte = (obj_type << 4) | (size & 0x0F)
+    size >>= 4
+    header = bytearray()
+    while size:
+        header.append(byte | 0x80)
+        byte = size & 0x7F
+        size >>= 7
+    header.append(byte)
+    return bytes(header)
+
+
+def write_pack(objects_dir, objects):
+    """Пишет объекты одним pack-файлом без дельт и индекс .idx версии 2."""
+    pack_dir = os.path.join(objects_dir, "pack")
+    os.makedirs(pack_dir, exist_ok=True)
+    tmp_path = os.path.join(pack_dir, "tmp.pack")
+    entries = []
+    with open(tmp_path, "wb") as f:
+        f.write(b"PACK" + struct.pack(">II", 2, 0))  # число объектов уточняется ниже
+        offset = 12
+        for obj_type, sha, body in objects:
+            entry = pack_entry_header(obj_type, len(body)) + zlib.compress(body)
+            f.write(entry)
+            entries.append((sha, zlib.crc32(entry), offset))
+            offset += len(entry)
+
+    # Число объектов известно только после записи: исправляем заголовок и пересчитываем контрольную сумму
+    with open(tmp_path, "r+b") as f:
+        f.seek(8)
+        f.write(struct.pack(">I", len(entries)))
+        f.seek(0)
+        checksum = hashlib.sha1()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            checksum.update(chunk)
+        pack_sha = checksum.digest()
+        f.write(pack_sha)
+
+    entries.sort()
+    fanout = [0] * 256
+    for sha, _, _ in entries:
+        fanout[sha[0]] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+    index = bytearray(b"\377tOc" + struct.pack(">I", 2) + struct.pack(">256I", *fanout))
+    index += b"".join(sha for sha, _, _ in entries)
+    index += b"".join(struct.pack(">I", crc) for _, crc, _ in entries)
+    index += b"".join(struct.pack(">I", offset) for _, _, offset in entries)
+    index += pack_sha
+    index += hashlib.sha1(index).digest()
+
+    name = os.path.join(pack_dir, f"pack-{pack_sha.hex()}")
+    os.replace(tmp_path, name + ".pack")
+    with open(name + ".idx", "wb") as f:
+        f.write(index)
+
+
+def generate_repository(path, topology, count, storage):
+    """Создаёт репозиторий с синтетической историей; storage — loose или packed."""
+    git_dir = os.path.join(path, ".git")
+    objects_dir = os.path.join(git_dir, "objects")
+    os.makedirs(os.path.join(git_dir, "refs", "heads"), exist_ok=True)
+    os.makedirs(os.path.join(git_dir, "refs", "tags"), exist_ok=True)
+    os.makedirs(objects_dir, exist_ok=True)
+
+    head = None
+
+    def track(objects):
+        nonlocal head
+        for obj in objects:
+            head = obj[1]
+            yield obj
+
+    if storage == "packed":
+        write_pack(objects_dir, track(generate_objects(topology, count)))
+    else:
+        for obj_type, sha, body in track(generate_objects(topology, count)):
+            write_loose(objects_dir, obj_type, sha, body)
+
+    with open(os.path.join(git_dir, "refs", "heads", "master"), "w") as f:
+        f.write(head.hex() + "\n")
+    with open(os.path.join(git_dir, "HEAD"), "w") as f:
+        f.write("ref: refs/heads/master\n")
+    return head.hex()
+
+
+def write_commit_graph(path):
+    """Строит commit-graph средствами git, если он установлен."""
+    if shutil.which("git") is None:
+        print("git не найден: commit-graph не строится.")
+        return
+    subprocess.run(["git", "commit-graph", "write", "--reachable"], cwd=path, check=True,
+                   capture_output=True)
+
+
+def measure(repo, work_dir, workers, track_memory):
+    """Замер collect_dependencies и записи графа в DOT: время и пик памяти."""
+    output_path = os.path.join(work_dir, "graph")
+    graph = GitDependencyGraph(repo, output_path, "", workers=workers, output_format="dot")
+    if track_memory:
+        tracemalloc.start()
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        graph.collect_dependencies()
+        collected = time.perf_counter()
+        collect_peak = tracemalloc.get_traced_memory()[1] if track_memory else 0
+        graph.build_graph()
+        built = time.perf_counter()
+    peak = 0
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    os.remove(graph.get_output_file())
+    return {"commits": len(graph.dag), "collect": collected - start, "build": built - collected,
+            "collect_peak": collect_peak, "peak": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк GitDependencyGraph на синтетических репозиториях.")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=[10_000, 100_000],
+                        help="Число коммитов (например, 10000 100000 1000000).")
+    parser.add_argument("-t", "--topologies", nargs="+", choices=sorted(TOPOLOGIES), default=list(TOPOLOGIES),
+                        help="Форма истории.")
+    parser.add_argument("--storage", nargs="+", choices=["loose", "packed"], default=["loose", "packed"],
+                        help="Хранение объектов: неупакованные файлы или pack-файл.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Число потоков распаковки объектов.")
+    parser.add_argument("--commit-graph", action="store_true", help="Построить commit-graph (нужен git).")
+    parser.add_argument("--no-memory", action="store_true", help="Не измерять пик памяти (tracemalloc замедляет работу).")
+    args = parser.parse_args()
+
+    print(f"{'коммитов':>9} {'история':>7} {'объекты':>7} {'создание, с':>11} {'сбор, с':>8} "
+          f"{'ком/с':>9} {'запись, с':>9} {'пик сбора, МБ':>13} {'пик, МБ':>8}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for count in args.sizes:
+            for topology in args.topologies:
+                for storage in args.storage:
+                    repo = os.path.join(work_dir, f"{topology}_{storage}_{count}")
+                    start = time.perf_counter()
+                    generate_repository(repo, topology, count, storage)
+                    if args.commit_graph:
+                        write_commit_graph(repo)
+                    generated = time.perf_counter() - start
+                    result = measure(repo, work_dir, args.jobs, not args.no_memory)
+                    throughput = result["commits"] / result["collect"] if result["collect"] else 0.0
+                    print(f"{count:>9} {topology:>7} {storage:>7} {generated:>11.2f} {result['collect']:>8.2f} "
+                          f"{throughput:>9.0f} {result['build']:>9.2f} {result['collect_peak'] / 2 ** 20:>13.1f} "
+                          f"{result['peak'] / 2 ** 20:>8.1f}")
+                    shutil.rmtree(repo)
+
+
+if __name__ == "__main__":
+    main()
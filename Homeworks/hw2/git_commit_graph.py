@@ -0,0 +1,169 @@
+import os
+import struct
+from git_pack import map_file
+
+GRAPH_MAGIC = b"CGPH"
+CHUNK_OID_FANOUT = b"OIDF"
+CHUNK_OID_LOOKUP = b"OIDL"
+CHUNK_COMMIT_DATA = b"CDAT"
+CHUNK_EXTRA_EDGES = b"EDGE"
+# Значения позиции родителя в CDAT
+PARENT_NONE = 0x70000000
+PARENT_EXTRA_EDGES = 0x80000000
+COMMIT_DATA_SIZE = 36  # tree (20) + два родителя (2 x 4) + поколение и время (8)
+
+
+class CommitGraphFile:
+    """Один файл commit-graph: таблицы OID и рёбер к родителям в фиксированном бинарном формате."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = map_file(path)
+        magic, version, hash_version, chunk_count, self.base_count = struct.unpack(">4sBBBB", self.data[:8])
+        if magic != GRAPH_MAGIC or version != 1 or hash_version != 1:
+            raise ValueError(f"Неподдерживаемый формат commit-graph: {path}")
+        self.chunks = {}
+        for i in range(chunk_count):
+            pos = 8 + 12 * i
+            chunk_id, offset = struct.unpack(">4sQ", self.data[pos:pos + 12])
+            self.chunks[chunk_id] = offset
+        for required in (CHUNK_OID_FANOUT, CHUNK_OID_LOOKUP, CHUNK_COMMIT_DATA):
+            if required not in self.chunks:
+                raise ValueError(f"В commit-graph нет раздела {required.decode()}: {path}")
+        fanout = self.chunks[CHUNK_OID_FANOUT]
+        self.fanout = struct.unpack(">256I", self.data[fanout:fanout + 1024])
+        self.count = self.fanout[255]
+        self.oids_start = self.chunks[CHUNK_OID_LOOKUP]
+        self.commits_start = self.chunks[CHUNK_COMMIT_DATA]
+        self.edges_start = self.chunks.get(CHUNK_EXTRA_EDGES)
+
+    def sha_at(self, i):
+        pos = self.oids_start + 20 * i
+        return self.data[pos:pos + 20]
+
+    def lookup(self, sha):
+        """Бинарный поиск по таблице OID в диапазоне fanout; возвращает локальный номер или None."""
+        first = sha[0]
+        lo = self.fanout[first - 1] if first else 0
+        hi = self.fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self.sha_at(mid)
+            if current < sha:
+                lo = mid + 1
+            elif current > sha:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def commit_data(self, i):
+        pos = self.commits_start + COMMIT_DATA_SIZE * i + 20
+        return struct.unpack(">IIII", self.data[pos:pos + 16])
+
+    def parents(self, i):
+        """Глобальные позиции родителей i-го коммита."""
+        first, second, _, _ = self.commit_data(i)
+        parents = []
+        if first != PARENT_NONE:
+            parents.append(first)
+        if second == PARENT_NONE:
+            return parents
+        if not second & PARENT_EXTRA_EDGES:
+            parents.append(second)
+            return parents
+        # Коммит слияния с тремя и более родителями: продолжение в списке EDGE
+        pos = self.edges_start + 4 * (second & ~PARENT_EXTRA_EDGES)
+        while True:
+            edge = struct.unpack(">I", self.data[pos:pos + 4])[0]
+            parents.append(edge & ~PARENT_EXTRA_EDGES)
+            if edge & PARENT_EXTRA_EDGES:
+                return parents
+            pos += 4
+
+    def generation(self, i):
+        """Топологический уровень коммита (старшие 30 бит поля поколения)."""
+        return self.commit_data(i)[2] >> 2
+
+    def commit_time(self, i):
+        """Время коммита в секундах: 34 бита, старшие два — в младших битах поля поколения."""
+        _, _, generation, time = self.commit_data(i)
+        return ((generation & 3) << 32) | time
+
+
+class CommitGraph:
+    """Файл .git/objects/info/commit-graph или цепочка слоёв commit-graphs.
+
+    Позиции коммитов сквозные: слои нумеруются от базового к верхнему.
+    """
+
+    def __init__(self, paths):
+        self.layers = []
+        self.starts = []
+        total = 0
+        for path in paths:
+            layer = CommitGraphFile(path)
+            self.layers.append(layer)
+            self.starts.append(total)
+            total += layer.count
+        self.count = total
+
+    @classmethod
+    def load(cls, objects_dir):
+        """Загружает commit-graph репозитория или возвращает None, если его нет."""
+        info_dir = os.path.join(objects_dir, "info")
+        chain_path = os.path.join(info_dir, "commit-graphs", "commit-graph-chain")
+        if os.path.isfile(chain_path):
+            with open(chain_path, "r") as f:
+                hashes = [line.strip() for line in f if line.strip()]
+            paths = [os.path.join(info_dir, "commit-graphs", f"graph-{h}.graph") for h in hashes]
+            if all(os.path.isfile(path) for path in paths):
+                return cls(paths)
+        single_path = os.path.join(info_dir, "commit-graph")
+        if os.path.isfile(single_path):
+            return cls([single_path])
+        return None
+
+    def locate(self, position):
+        """Переводит сквозную позицию в (слой, локальный номер)."""
+        for layer, start in zip(reversed(self.layers), reversed(self.starts)):
+            if position >= start:
+                return layer, position - start
+        raise IndexError(position)
+
+    def lookup(self, sha):
+        """Сквозная позиция коммита по 20-байтовому SHA или None."""
+        for layer, start in zip(self.layers, self.starts):
+            index = layer.lookup(sha)
+            if index is not None:
+                return start + index
+        return None
+
+    def sha_at(self, position):
+        layer, index = self.locate(position)
+        return layer.sha_at(index)
+
+    def parent_positions(self, position):
+        layer, index = self.locate(position)
+        return layer.parents(index)
+
+    def generation(self, position):
+        layer, index = self.locate(position)
+        return layer.generation(index)
+
+    def commit_time(self, position):
+        layer, index = self.locate(position)
+        return layer.commit_time(index)
+
+    def parents_of(self, sha):
+        """Родители коммита в hex или None, если коммит не покрыт commit-graph."""
+        try:
+            sha_bytes = bytes.fromhex(sha)
+        except ValueError:
+            return None
+        if len(sha_bytes) != 20:
+            return None
+        position = self.lookup(sha_bytes)
+        if position is None:
+            return None
+        return [self.sha_at(parent).hex() for parent in self.parent_positions(position)]
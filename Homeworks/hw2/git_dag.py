@@ -0,0 +1,207 @@
+from array import array
+from collections.abc import MutableMapping
+
+SHA_SIZE = 20
+NOT_VISITED = -1
+EMPTY_SLOT = -1
+# Время коммита не известно
+NO_TIME = -(1 << 63)
+# Начальный размер хэш-таблицы номеров (степень двойки); заполнение держится не выше половины
+INITIAL_SLOTS = 1024
+
+
+def to_key(sha):
+    """Ключ для интернирования: 20-байтовый SHA или исходная строка, если это не SHA-1 в hex."""
+    if len(sha) == 2 * SHA_SIZE:
+        try:
+            return bytes.fromhex(sha)
+        except ValueError:
+            pass
+    return sha
+
+
+class CommitDag:
+    """Компактный граф коммитов.
+
+    SHA хранятся подряд в одном буфере по 20 байт и получают целочисленные номера
+    в порядке первого появления. Номер по SHA ищется в хэш-таблице с открытой адресацией
+    на массиве номеров: SHA уже равномерно распределены, поэтому хэшем служат их первые байты,
+    а сами ключи не дублируются в отдельных объектах. Рёбра к родителям лежат в общем массиве edges
+    (как в CSR): у прочитанного коммита i родители — edges[starts[i]:starts[i] + counts[i]].
+    Коммиты, известные только как родители, имеют starts[i] == NOT_VISITED.
+    """
+
+    def __init__(self):
+        self.oids = bytearray()
+        self.slots = array("q", [EMPTY_SLOT]) * INITIAL_SLOTS
+        # Имена, не являющиеся SHA-1 в hex (повреждённые или тестовые объекты): номер -> строка
+        self.names = {}
+        self.name_ids = {}
+        self.starts = array("q")
+        self.counts = array("I")
+        self.edges = array("I")
+        # Номера прочитанных коммитов в порядке добавления
+        self.order = array("I")
+        # Время коммитов (секунды Unix) по номеру; массив заводится при первом set_time,
+        # чтобы обход без ограничения по датам и без кэша не тратил на него память
+        self.times = None
+
+    def __len__(self):
+        return len(self.order)
+
+    def probe(self, key):
+        """Индекс ячейки хэш-таблицы с ключом key или первой пустой ячейки на его пути."""
+        mask = len(self.slots) - 1
+        slot = int.from_bytes(key[:8], "little") & mask
+        oids = self.oids
+        while True:
+            node = self.slots[slot]
+            if node == EMPTY_SLOT or oids[SHA_SIZE * node:SHA_SIZE * (node + 1)] == key:
+                return slot
+            slot = (slot + 1) & mask
+
+    def grow(self):
+        """Удваивает хэш-таблицу и заново раскладывает в неё номера."""
+        self.slots = array("q", [EMPTY_SLOT]) * (2 * len(self.slots))
+        for node in range(len(self.starts)):
+            if node not in self.names:
+                self.slots[self.probe(self.oids[SHA_SIZE * node:SHA_SIZE * (node + 1)])] = node
+
+    def new_node(self):
+        node = len(self.starts)
+        self.starts.append(NOT_VISITED)
+        self.counts.append(0)
+        return node
+
+    def intern(self, sha):
+        """Номер коммита по SHA в hex; неизвестный SHA получает новый номер."""
+        key = to_key(sha)
+        if not isinstance(key, bytes):
+            node = self.name_ids.get(key)
+            if node is None:
+                node = self.new_node()
+                self.oids += bytes(SHA_SIZE)
+                self.names[node] = key
+                self.name_ids[key] = node
+            return node
+        return self.intern_oid(key)
+
+    def intern_oid(self, key):
+        """Номер коммита по 20-байтовому SHA; неизвестный SHA получает новый номер."""
+        slot = self.probe(key)
+        node = self.slots[slot]
+        if node != EMPTY_SLOT:
+            return node
+        node = self.new_node()
+        self.oids += key
+        self.slots[slot] = node
+        if 2 * len(self.starts) > len(self.slots):
+            self.grow()
+        return node
+
+    def find(self, sha):
+        """Номер коммита по SHA в hex или None."""
+        key = to_key(sha)
+        if not isinstance(key, bytes):
+            return self.name_ids.get(key)
+        return self.find_oid(key)
+
+    def find_oid(self, key):
+        """Номер коммита по 20-байтовому SHA или None."""
+        node = self.slots[self.probe(key)]
+        return None if node == EMPTY_SLOT else node
+
+    def sha(self, node):
+        """SHA коммита в hex по номеру."""
+        name = self.names.get(node)
+        if name is not None:
+            return name
+        return self.oids[SHA_SIZE * node:SHA_SIZE * (node + 1)].hex()
+
+    def oid(self, node):
+        """20-байтовый SHA коммита по номеру или None для имени не в формате SHA-1."""
+        if node in self.names:
+            return None
+        return bytes(self.oids[SHA_SIZE * node:SHA_SIZE * (node + 1)])
+
+    def is_visited(self, node):
+        return self.starts[node] != NOT_VISITED
+
+    def add(self, sha, parents):
+        """Добавляет прочитанный коммит и его родителей; повторное добавление заменяет рёбра."""
+        return self.set_parents(self.intern(sha), [self.intern(parent) for parent in parents])
+
+    def add_oids(self, oid, parent_oids):
+        """Как add, но SHA коммита и родителей заданы 20-байтовыми строками (без перевода в hex)."""
+        return self.set_parents(self.intern_oid(oid), [self.intern_oid(parent) for parent in parent_oids])
+
+    def set_parents(self, node, parent_ids):
+        if not self.is_visited(node):
+            self.order.append(node)
+        self.starts[node] = len(self.edges)
+        self.counts[node] = len(parent_ids)
+        self.edges.extend(parent_ids)
+        return node
+
+    def set_time(self, node, time):
+        if self.times is None:
+            self.times = array("q")
+        if len(self.times) < len(self.starts):
+            self.times.extend(array("q", [NO_TIME]) * (len(self.starts) - len(self.times)))
+        self.times[node] = NO_TIME if time is None else time
+
+    def commit_time(self, node):
+        """Время коммита, сохранённое при обходе, или None."""
+        if self.times is None or node >= len(self.times) or self.times[node] == NO_TIME:
+            return None
+        return self.times[node]
+
+    def parent_ids(self, node):
+        """Номера родителей прочитанного коммита (пустой срез для непрочитанного)."""
+        start = self.starts[node]
+        if start == NOT_VISITED:
+            return self.edges[0:0]
+        return self.edges[start:start + self.counts[node]]
+
+    def parents(self, sha):
+        """Родители коммита в hex или None, если коммит не прочитан."""
+        node = self.find(sha)
+        if node is None or not self.is_visited(node):
+            return None
+        return [self.sha(parent) for parent in self.parent_ids(node)]
+
+
+class DependencyView(MutableMapping):
+    """Представление CommitDag в виде словаря SHA -> список SHA родителей.
+
+    Сохраняет прежний интерфейс self.dependencies; списки родителей строятся при обращении.
+    """
+
+    def __init__(self, dag):
+        self.dag = dag
+
+    def __getitem__(self, sha):
+        parents = self.dag.parents(sha)
+        if parents is None:
+            raise KeyError(sha)
+        return parents
+
+    def __setitem__(self, sha, parents):
+        self.dag.add(sha, parents)
+
+    def __delitem__(self, sha):
+        raise TypeError("Удаление коммитов из графа не поддерживается.")
+
+    def __contains__(self, sha):
+        node = self.dag.find(sha)
+        return node is not None and self.dag.is_visited(node)
+
+    def __iter__(self):
+        for node in self.dag.order:
+            yield self.dag.sha(node)
+
+    def __len__(self):
+        return len(self.dag)
+
+    def __repr__(self):
+        return f"DependencyView({len(self)} коммитов)"
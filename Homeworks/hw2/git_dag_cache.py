@@ -0,0 +1,103 @@
+import os
+import struct
+import hashlib
+import tempfile
+from git_dag import CommitDag, NO_TIME
+
+CACHE_MAGIC = b"GDAG"
+CACHE_VERSION = 2
+
+
+def cache_path(cache_dir, repo_path):
+    """Путь к файлу кэша: имя — хэш абсолютного пути репозитория."""
+    key = hashlib.sha1(os.path.abspath(repo_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.dag")
+
+
+def iter_records(dag, skip=None):
+    """Записи кэша для прочитанных коммитов dag в порядке добавления.
+
+    Коммиты, прочитанные в skip, и коммиты с SHA не в формате hex пропускаются.
+    """
+    for node in dag.order:
+        oid = dag.oid(node)
+        if oid is None:
+            continue
+        if skip is not None:
+            skip_node = skip.find_oid(oid)
+            if skip_node is not None and skip.is_visited(skip_node):
+                continue
+        parent_oids = [dag.oid(parent) for parent in dag.parent_ids(node)]
+        if None in parent_oids:
+            continue
+        commit_time = dag.commit_time(node)
+        yield (oid + struct.pack(">qH", NO_TIME if commit_time is None else commit_time, len(parent_oids))
+               + b"".join(parent_oids))
+
+
+def save_dag_cache(path, repo_path, dag, base=None):
+    """Сохраняет граф коммитов: SHA (20 байт), время коммита (8 байт, NO_TIME — неизвестно),
+    число родителей (2 байта), SHA родителей.
+
+    Записи берутся прямо из массивов CommitDag: сначала коммиты из base (графа, загруженного
+    из кэша), которых нет в dag, затем коммиты dag. Коммиты с SHA не в формате hex
+    пропускаются. Файл заменяется атомарно.
+    """
+    repo_key = os.path.abspath(repo_path).encode("utf-8")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(CACHE_MAGIC + struct.pack(">BH", CACHE_VERSION, len(repo_key)) + repo_key)
+            count_offset = f.tell()
+            f.write(struct.pack(">I", 0))  # число записей уточняется после записи
+            count = 0
+            if base is not None:
+                for record in iter_records(base, skip=dag):
+                    f.write(record)
+                    count += 1
+            for record in iter_records(dag):
+                f.write(record)
+                count += 1
+            f.seek(count_offset)
+            f.write(struct.pack(">I", count))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_dag_cache(path, repo_path):
+    """Загружает граф коммитов из кэша в CommitDag; для чужого или повреждённого файла граф пуст."""
+    if not os.path.isfile(path):
+        return CommitDag()
+    with open(path, "rb") as f:
+        data = f.read()
+    dag = CommitDag()
+    try:
+        if data[:4] != CACHE_MAGIC:
+            raise ValueError("неверная сигнатура")
+        version, key_length = struct.unpack_from(">BH", data, 4)
+        if version != CACHE_VERSION:
+            raise ValueError(f"неподдерживаемая версия {version}")
+        pos = 7 + key_length
+        if data[7:pos].decode("utf-8") != os.path.abspath(repo_path):
+            raise ValueError("кэш относится к другому репозиторию")
+        count = struct.unpack_from(">I", data, pos)[0]
+        pos += 4
+        for _ in range(count):
+            commit_time, parent_count = struct.unpack_from(">qH", data, pos + 20)
+            end = pos + 30 + 20 * parent_count
+            if end > len(data):
+                raise ValueError("файл обрезан")
+            node = dag.add_oids(data[pos:pos + 20], [data[i:i + 20] for i in range(pos + 30, end, 20)])
+            if commit_time != NO_TIME:
+                dag.set_time(node, commit_time)
+            pos = end
+        if pos != len(data):
+            raise ValueError("лишние данные в конце файла")
+    except (ValueError, struct.error, UnicodeDecodeError) as e:
+        print(f"Кэш {path} не используется: {e}")
+        return CommitDag()
+    return dag
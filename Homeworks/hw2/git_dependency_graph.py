@@ -1,15 +1,70 @@
 import os
+import re
 import zlib
 import argparse
-from graphviz import Digraph
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import graphviz
+from git_pack import PackStore, TYPE_NAMES, TYPE_CODES, PREFIX_STEP, inflate_prefix
+from git_commit_graph import CommitGraph
+from git_dag_cache import cache_path, load_dag_cache, save_dag_cache, iter_records
+from git_dag import CommitDag, DependencyView
+from git_graph_writer import WRITERS
+from git_reduce import reduce_dag
+from git_query import CommitQuery
+
+
+# Конец заголовков коммита
+COMMIT_HEADER_END = b"\n\n"
 
 
 class GitDependencyGraph:
-    def __init__(self, repo_path, output_path, graphviz_path):
+    def __init__(self, repo_path, output_path, graphviz_path, use_commit_graph=True, workers=1,
+                 max_in_flight=1024, cache_dir=None, all_refs=False, output_format="png", render=False,
+                 first_parent=False, max_depth=None, since=None, until=None, collapse=False):
         self.repo_path = repo_path
         self.output_path = output_path
         self.graphviz_path = graphviz_path
-        self.dependencies = {}
+        self.use_commit_graph = use_commit_graph
+        # Число потоков распаковки и предел одновременно обрабатываемых объектов
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        # Граф коммитов в компактном виде; self.dependencies — его словарное представление
+        self.dag = CommitDag()
+        # Обход всех веток и тегов вместо одного HEAD; SHA коммита -> указывающие на него ссылки
+        self.all_refs = all_refs
+        self.ref_names = {}
+        # Каталог с кэшем графа коммитов между запусками и загруженный из него граф (CommitDag)
+        self.cache_dir = cache_dir
+        self.cached_dag = CommitDag()
+        # Формат результата: png (DOT с отрисовкой) или один из WRITERS; render — отрисовать и DOT.
+        # writer получает коммиты прямо во время обхода
+        self.output_format = output_format
+        self.render = render or output_format == "png"
+        self.writer = None
+        # Сокращение графа: только первые родители, число уровней от стартовых коммитов,
+        # диапазон времени коммитов (секунды Unix) и свёртка линейных цепочек
+        self.first_parent = first_parent
+        self.max_depth = max_depth
+        self.since = since
+        self.until = until
+        self.collapse = collapse
+        self.starts = []
+        # Запросы к графу (предки, общие предки, достижимость); строятся после обхода
+        self.query = None
+        self.pack_store = None
+        self.commit_graph = None
+
+    @property
+    def dependencies(self):
+        """Граф коммитов как словарь SHA -> список SHA родителей."""
+        return DependencyView(self.dag)
+
+    @dependencies.setter
+    def dependencies(self, dependencies):
+        self.dag = CommitDag()
+        for sha, parents in dependencies.items():
+            self.dag.add(sha, parents)
 
     def get_git_dir(self):
         """Находит директорию .git в указанном репозитории."""
@@ -18,14 +73,62 @@ class GitDependencyGraph:
             raise FileNotFoundError(f"Каталог .git не найден в репозитории: {self.repo_path}")
         return git_dir
 
+    def get_pack_store(self):
+        """Открывает (один раз) pack-файлы из .git/objects/pack."""
+        if self.pack_store is None:
+            objects_dir = os.path.join(self.get_git_dir(), "objects")
+            self.pack_store = PackStore(objects_dir, self.read_loose_typed)
+        return self.pack_store
+
+    def get_commit_graph(self):
+        """Загружает (один раз) .git/objects/info/commit-graph, если он есть и разрешён."""
+        if self.commit_graph is None and self.use_commit_graph:
+            try:
+                self.commit_graph = CommitGraph.load(os.path.join(self.get_git_dir(), "objects"))
+            except ValueError as e:
+                print(f"commit-graph не используется: {e}")
+            if self.commit_graph is None:
+                self.use_commit_graph = False
+        return self.commit_graph
+
+    def read_loose_typed(self, sha):
+        """Читает неупакованный объект по 20-байтовому SHA и возвращает (тип, данные)."""
+        obj_path = os.path.join(self.get_git_dir(), "objects", sha[:1].hex(), sha[1:].hex())
+        if not os.path.isfile(obj_path):
+            return None
+        with open(obj_path, "rb") as f:
+            data = zlib.decompress(f.read())
+        header, _, body = data.partition(b"\0")
+        return TYPE_CODES[header.split(b" ")[0]], body
+
+    def read_packed_object(self, sha):
+        """Читает объект из pack-файлов в том же формате, что и неупакованный."""
+        try:
+            sha_bytes = bytes.fromhex(sha)
+        except ValueError:
+            return None
+        if len(sha_bytes) != 20:
+            return None
+        found = self.get_pack_store().read(sha_bytes)
+        if found is None:
+            return None
+        obj_type, body = found
+        return TYPE_NAMES[obj_type] + b" %d\0" % len(body) + body
+
     def read_object(self, sha):
-        """Читает объект Git из .git/objects."""
+        """Читает объект Git из .git/objects или из pack-файлов."""
         git_dir = self.get_git_dir()
         obj_dir = os.path.join(git_dir, "objects", sha[:2])  # Первые два символа — подпапка
         obj_path = os.path.join(obj_dir, sha[2:])  # Остальная часть — имя файла
         if not os.path.isfile(obj_path):
-            print(f"Пропущен отсутствующий объект {sha}. Возможно, репозиторий повреждён.")
-            return None
+            try:
+                data = self.read_packed_object(sha)
+            except (zlib.error, ValueError) as e:
+                print(f"Ошибка при чтении упакованного объекта {sha}: {e}")
+                return None
+            if data is None:
+                print(f"Пропущен отсутствующий объект {sha}. Возможно, репозиторий повреждён.")
+            return data
         try:
             with open(obj_path, "rb") as f:
                 compressed_data = f.read()
@@ -35,22 +138,94 @@ class GitDependencyGraph:
             print(f"Ошибка при декомпрессии объекта {sha}: {e}")
             return None
 
+    def read_commit_header(self, sha):
+        """Читает только заголовки коммита: распаковка останавливается на пустой строке.
+
+        Возвращает данные в том же формате, что и read_object, но без сообщения коммита.
+        """
+        obj_path = os.path.join(self.get_git_dir(), "objects", sha[:2], sha[2:])
+        try:
+            if os.path.isfile(obj_path):
+                with open(obj_path, "rb") as f:
+                    return inflate_prefix(iter(lambda: f.read(PREFIX_STEP), b""), COMMIT_HEADER_END)
+            found = None
+            try:
+                sha_bytes = bytes.fromhex(sha)
+            except ValueError:
+                sha_bytes = None
+            if sha_bytes is not None and len(sha_bytes) == 20:
+                found = self.get_pack_store().read_prefix(sha_bytes, COMMIT_HEADER_END)
+        except (zlib.error, ValueError) as e:
+            print(f"Ошибка при декомпрессии объекта {sha}: {e}")
+            return None
+        if found is None:
+            print(f"Пропущен отсутствующий объект {sha}. Возможно, репозиторий повреждён.")
+            return None
+        obj_type, size, data = found
+        return TYPE_NAMES[obj_type] + b" %d\0" % size + data
+
     def parse_commit(self, data):
-        """Парсит содержимое объекта коммита."""
+        """Парсит заголовки коммита прямо в байтах, без decode и split всего объекта."""
         if data is None:
             return []
+        # Пропускаем заголовок объекта "commit <размер>\0", если он есть
+        pos = data.find(b"\0") + 1
+        end = data.find(COMMIT_HEADER_END, pos)
+        if end == -1:
+            end = len(data)
+        parents = []
+        while pos < end:
+            line_end = data.find(b"\n", pos, end)
+            if line_end == -1:
+                line_end = end
+            if data.startswith(b"parent ", pos, line_end):
+                parents.append(data[pos + 7:line_end].strip().decode("ascii", errors="replace"))  # SHA родителя
+            pos = line_end + 1
+        return parents
+
+    def parse_commit_time(self, data):
+        """Время коммита (секунды Unix) из строки committer или None."""
+        if data is None:
+            return None
+        pos = data.find(b"\ncommitter ")
+        if pos == -1:
+            return None
+        line_end = data.find(b"\n", pos + 1)
+        line = data[pos + 1:line_end if line_end != -1 else len(data)]
         try:
-            lines = data.decode(errors="replace").split("\n")
-            parents = []
-            for line in lines:
-                if line.startswith("parent "):
-                    parents.append(line.split()[1])  # SHA родительского коммита
-                elif line == "":  # Конец заголовков
-                    break
-            return parents
-        except Exception as e:
-            print(f"Ошибка при разборе данных коммита: {e}")
-            return []
+            return int(line.rsplit(b" ", 2)[-2])
+        except (ValueError, IndexError):
+            return None
+
+    def graph_commit_time(self, sha):
+        """Время коммита из commit-graph или None, если коммит им не покрыт."""
+        commit_graph = self.get_commit_graph()
+        if commit_graph is not None:
+            sha_bytes = bytes.fromhex(sha) if len(sha) == 40 else None
+            position = commit_graph.lookup(sha_bytes) if sha_bytes is not None else None
+            if position is not None:
+                return commit_graph.commit_time(position)
+        return None
+
+    def read_commit_time(self, sha):
+        """Время коммита из commit-graph или из заголовков объекта."""
+        commit_time = self.graph_commit_time(sha)
+        if commit_time is not None:
+            return commit_time
+        return self.parse_commit_time(self.read_commit_header(sha))
+
+    def get_commit_time(self, sha):
+        """Время коммита: сохранённое при обходе или прочитанное из репозитория."""
+        node = self.dag.find(sha)
+        if node is not None:
+            commit_time = self.dag.commit_time(node)
+            if commit_time is not None:
+                return commit_time
+        return self.read_commit_time(sha)
+
+    def is_reduced(self):
+        """Включён ли хотя бы один режим сокращения графа."""
+        return self.first_parent or self.collapse or self.max_depth is not None or self.uses_dates()
 
     def check_repository_integrity(self):
         """Проверяет, что репозиторий содержит хотя бы один коммит."""
@@ -74,8 +249,84 @@ class GitDependencyGraph:
 
         return True
 
-    def collect_dependencies(self):
-        """Собирает зависимости коммитов, обходя историю из HEAD."""
+    def read_packed_refs(self):
+        """Читает .git/packed-refs: имя ссылки -> SHA.
+
+        Для аннотированных тегов со строкой «^» возвращается уже развёрнутый SHA коммита,
+        а имя тега попадает во второе возвращаемое множество.
+        """
+        refs = {}
+        peeled = set()
+        packed_path = os.path.join(self.get_git_dir(), "packed-refs")
+        if not os.path.isfile(packed_path):
+            return refs, peeled
+        last_ref = None
+        with open(packed_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("^"):
+                    # Строка очищенного (peeled) значения предыдущего тега
+                    if last_ref is not None:
+                        refs[last_ref] = line[1:]
+                        peeled.add(last_ref)
+                    continue
+                sha, _, name = line.partition(" ")
+                refs[name] = sha
+                last_ref = name
+        return refs, peeled
+
+    def read_refs(self):
+        """Собирает все ветки и теги: неупакованные ссылки перекрывают packed-refs.
+
+        Возвращает словарь имя -> SHA и множество имён, уже развёрнутых до коммита.
+        """
+        packed, peeled = self.read_packed_refs()
+        refs = {name: sha for name, sha in packed.items() if name.startswith(("refs/heads/", "refs/tags/"))}
+        git_dir = self.get_git_dir()
+        for namespace in ("heads", "tags"):
+            root = os.path.join(git_dir, "refs", namespace)
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, git_dir).replace(os.sep, "/")
+                    with open(path, "r") as f:
+                        refs[name] = f.readline().strip()
+                    peeled.discard(name)
+        return refs, peeled
+
+    def resolve_ref(self, name):
+        """SHA, на который указывает ссылка (неупакованная или из packed-refs), или None."""
+        ref_path = os.path.join(self.get_git_dir(), name)
+        if os.path.isfile(ref_path):
+            with open(ref_path, "r") as f:
+                return f.readline().strip()
+        return self.read_packed_refs()[0].get(name)
+
+    def peel_to_commit(self, sha):
+        """Разворачивает аннотированные теги до коммита; для тегов не на коммит возвращает None.
+
+        Тип цели берётся из заголовка тега, поэтому сам коммит здесь не читается.
+        """
+        for _ in range(16):
+            data = self.read_commit_header(sha)
+            if data is None:
+                return None
+            if data.startswith(b"commit "):
+                return sha
+            if not data.startswith(b"tag "):
+                return None
+            headers = data[data.find(b"\0") + 1:].split(b"\n", 2)
+            if len(headers) < 2 or not headers[0].startswith(b"object ") or not headers[1].startswith(b"type "):
+                return None
+            sha = headers[0][7:].decode("ascii")
+            if headers[1] == b"type commit":
+                return sha
+        return None
+
+    def get_start_commits(self):
+        """Коммиты, с которых начинается обход: HEAD и, в режиме all_refs, все ветки и теги."""
         git_dir = self.get_git_dir()
         head_path = os.path.join(git_dir, "HEAD")
         if not os.path.isfile(head_path):
@@ -85,54 +336,285 @@ class GitDependencyGraph:
         with open(head_path, "r") as f:
             ref = f.readline().strip()
         if ref.startswith("ref:"):
-            ref_path = os.path.join(git_dir, ref[5:])
-            if not os.path.isfile(ref_path):
-                raise FileNotFoundError(f"Файл ref {ref_path} не найден.")
-            with open(ref_path, "r") as f:
-                current_commit = f.readline().strip()
+            current_commit = self.resolve_ref(ref[5:])
+            if current_commit is None:
+                raise FileNotFoundError(f"Файл ref {os.path.join(git_dir, ref[5:])} не найден.")
         else:
             current_commit = ref  # Если в HEAD уже прямой SHA
 
-        # Рекурсивно обходим историю коммитов
-        to_visit = [current_commit]
-        visited = set()
+        starts = [current_commit]
+        self.ref_names = {current_commit: ["HEAD"]}
+        if self.all_refs:
+            refs, peeled = self.read_refs()
+            for name, sha in sorted(refs.items()):
+                # Ветки всегда указывают на коммиты, теги могут быть аннотированными
+                if name.startswith("refs/heads/") or name in peeled:
+                    commit = sha
+                else:
+                    commit = self.peel_to_commit(sha)
+                if commit is None:
+                    print(f"Ссылка {name} не указывает на коммит и пропущена.")
+                    continue
+                self.ref_names.setdefault(commit, []).append(name)
+                if commit not in starts:
+                    starts.append(commit)
+        return starts
 
-        while to_visit:
-            sha = to_visit.pop()
-            if sha in visited:
-                continue
-            visited.add(sha)
+    def collect_dependencies(self):
+        """Собирает зависимости коммитов, обходя историю из HEAD (или из всех веток и тегов)."""
+        commit_graph = self.get_commit_graph()
+        starts = self.get_start_commits()
+        self.starts = starts
 
-            try:
-                data = self.read_object(sha)
-                if data is None:
+        if self.cache_dir:
+            dag_cache_path = cache_path(self.cache_dir, self.repo_path)
+            self.cached_dag = load_dag_cache(dag_cache_path, self.repo_path)
+
+        # Ограничение глубины требует обхода по уровням
+        if self.workers > 1 or self.max_depth is not None:
+            self.walk_parallel(starts, commit_graph)
+        else:
+            # Обходим историю коммитов по номерам в графе; прочитанные коммиты отмечены
+            # в самом графе, поэтому общая история нескольких веток читается один раз
+            to_visit = [self.dag.intern(sha) for sha in reversed(starts)]
+            skipped = set()  # коммиты, которые не удалось прочитать
+
+            while to_visit:
+                node = to_visit.pop()
+                if self.dag.is_visited(node) or node in skipped:
                     continue
-                parents = self.parse_commit(data)
-                self.dependencies[sha] = parents
-                to_visit.extend(parents)  # Добавляем родителей для дальнейшего обхода
-            except Exception as e:
-                print(f"Ошибка при обработке коммита {sha}: {e}")
+
+                sha = self.dag.sha(node)
+                loaded = self.load_commit(sha, commit_graph)
+                if loaded is None:
+                    skipped.add(node)
+                    continue
+                node = self.add_commit(sha, *loaded)
+                # Добавляем родителей для дальнейшего обхода
+                if self.expands(node):
+                    to_visit.extend(self.dag.parent_ids(node)[:1] if self.first_parent else self.dag.parent_ids(node))
 
         if not self.dependencies:
             print("Не найдено ни одного коммита для анализа. Проверьте репозиторий.")
             return False
 
+        # Сохраняем кэш, только если в этом запуске прочитаны новые коммиты
+        if self.cache_dir and any(True for _ in iter_records(self.dag, skip=self.cached_dag)):
+            save_dag_cache(dag_cache_path, self.repo_path, self.dag, base=self.cached_dag)
+
         return True
 
-    def build_graph(self):
-        """Создаёт граф зависимости в формате DOT и сохраняет в файл."""
-        print("Создание графа зависимостей...")
-        dot = Digraph(comment="Git Dependency Graph", format="png")
+    def uses_dates(self):
+        return self.since is not None or self.until is not None
+
+    def keeps_times(self):
+        """Время коммитов нужно при ограничении по датам и для записи в кэш."""
+        return self.uses_dates() or bool(self.cache_dir)
+
+    def load_commit(self, sha, commit_graph):
+        """Родители коммита и его время или None, если коммит прочитать не удалось.
+
+        Время берётся из того же источника, что и родители: кэш прошлых запусков, commit-graph
+        или уже распакованные заголовки. Оно нужно только при ограничении по датам или для
+        кэша (иначе None); заголовок ради времени читается, только если его нет в кэше,
+        а обход ограничен по датам.
+        """
+        with_time = self.keeps_times()
+        try:
+            # Коммиты из кэша прошлых запусков не читаются повторно
+            node = self.cached_dag.find(sha)
+            if node is not None and self.cached_dag.is_visited(node):
+                commit_time = self.cached_dag.commit_time(node)
+                if commit_time is None and self.uses_dates():
+                    commit_time = self.read_commit_time(sha)
+                return self.cached_dag.parents(sha), commit_time
+            # Родители из commit-graph берутся без распаковки объекта
+            parents = commit_graph.parents_of(sha) if commit_graph is not None else None
+            if parents is not None:
+                return parents, self.graph_commit_time(sha) if with_time else None
+            data = self.read_commit_header(sha)
+            if data is None:
+                return None
+            return self.parse_commit(data), self.parse_commit_time(data) if with_time else None
+        except Exception as e:
+            print(f"Ошибка при обработке коммита {sha}: {e}")
+            return None
+
+    def add_commit(self, sha, parents, commit_time):
+        """Добавляет прочитанный коммит в граф (со временем, если оно хранится) и передаёт писателю."""
+        node = self.dag.add(sha, parents)
+        if self.keeps_times():
+            self.dag.set_time(node, commit_time)
+        self.emit(node)
+        return node
+
+    def expands(self, node):
+        """Продолжать ли обход к родителям: коммиты старше since обход останавливают."""
+        if self.since is None:
+            return True
+        commit_time = self.dag.commit_time(node)
+        return commit_time is None or commit_time >= self.since
+
+    def walk_parallel(self, starts, commit_graph):
+        """Обход истории по фронтам: коммиты фронта распаковываются пулом потоков.
+
+        zlib отпускает GIL при распаковке, поэтому ширина фронта (ветви, слияния)
+        превращается в параллельную работу. В пул одновременно отдаётся не более
+        max_in_flight коммитов. Номер фронта — глубина от стартовых коммитов:
+        при max_depth родители коммитов последнего уровня не читаются.
+        """
+        self.get_pack_store()  # открываем pack-файлы до запуска потоков
+        frontier = []
+        queued = bytearray()  # флаг «коммит уже поставлен в очередь» по номеру в графе
+        for sha in starts:
+            node = self.dag.intern(sha)
+            queued.extend(bytes(len(self.dag.starts) - len(queued)))
+            if not queued[node]:
+                queued[node] = 1
+                frontier.append(sha)
+        level = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while frontier:
+                next_frontier = []
+                for i in range(0, len(frontier), self.max_in_flight):
+                    window = frontier[i:i + self.max_in_flight]
+                    loaded = executor.map(self.load_commit, window, [commit_graph] * len(window))
+                    for sha, commit in zip(window, loaded):
+                        if commit is None:
+                            continue
+                        node = self.add_commit(sha, *commit)
+                        if self.max_depth is not None and level + 1 >= self.max_depth:
+                            continue
+                        if not self.expands(node):
+                            continue
+                        queued.extend(bytes(len(self.dag.starts) - len(queued)))
+                        parent_ids = self.dag.parent_ids(node)
+                        for parent in parent_ids[:1] if self.first_parent else parent_ids:
+                            if not queued[parent]:
+                                queued[parent] = 1
+                                next_frontier.append(self.dag.sha(parent))
+                frontier = next_frontier
+                level += 1
 
-        # Добавляем узлы и связи в граф
-        for commit, parents in self.dependencies.items():
-            dot.node(commit, commit)
-            for parent in parents:
-                dot.edge(commit, parent)
+    def get_query(self):
+        """Объект запросов к текущему графу; поколения пересчитываются, если граф изменился."""
+        if self.query is None or self.query.dag is not self.dag or len(self.query.generations) != len(self.dag.starts):
+            self.query = CommitQuery(self.dag)
+        return self.query
 
-        # Указываем путь к Graphviz
-        dot.engine = "dot"
-        dot.render(self.output_path, cleanup=True)
+    def resolve_commit(self, name):
+        """SHA коммита по имени: HEAD, ветка или тег (полное или короткое имя), SHA или его префикс.
+
+        Суффиксы ~N (N-й предок по первым родителям) и ^N (N-й родитель) разбираются по собранному графу.
+        """
+        base, suffix = re.fullmatch(r"(.*?)((?:[~^]\d*)*)", name).groups()
+        sha = self.resolve_name(base)
+        for op, count in re.findall(r"([~^])(\d*)", suffix):
+            count = int(count) if count else 1
+            for _ in range(count if op == "~" else 1):
+                parents = self.dependencies.get(sha)
+                index = 0 if op == "~" else count - 1
+                if parents is None or index >= len(parents):
+                    raise ValueError(f"Коммит {name} не найден.")
+                sha = parents[index]
+        return sha
+
+    def resolve_name(self, name):
+        if name == "HEAD" and self.starts:
+            return self.starts[0]
+        refs, peeled = self.read_refs()
+        for ref in (name, f"refs/heads/{name}", f"refs/tags/{name}"):
+            if ref in refs:
+                if ref.startswith("refs/heads/") or ref in peeled:
+                    return refs[ref]
+                commit = self.peel_to_commit(refs[ref])
+                if commit is not None:
+                    return commit
+        prefix = name.lower()
+        if len(prefix) >= 4 and all(char in "0123456789abcdef" for char in prefix):
+            if len(prefix) == 40:
+                return prefix
+            matches = [sha for sha in self.dependencies if sha.startswith(prefix)]
+            if len(matches) == 1:
+                return matches[0]
+            if matches:
+                raise ValueError(f"Префикс {name} неоднозначен: {len(matches)} коммитов.")
+        raise ValueError(f"Коммит {name} не найден.")
+
+    def is_ancestor(self, ancestor, descendant):
+        """Является ли ancestor предком descendant."""
+        return self.get_query().is_ancestor(self.resolve_commit(ancestor), self.resolve_commit(descendant))
+
+    def merge_base(self, first, second):
+        """Лучшие общие предки двух коммитов."""
+        return self.get_query().merge_bases(self.resolve_commit(first), self.resolve_commit(second))
+
+    def reachable_only(self, include, exclude):
+        """Коммиты, достижимые из include, но не из exclude."""
+        return self.get_query().only(self.resolve_commit(include), self.resolve_commit(exclude))
+
+    def run_query(self, name, first, second):
+        """Выполняет запрос из командной строки и печатает ответ."""
+        if not self.collect_dependencies():
+            print("Не удалось собрать граф зависимостей.")
+            return
+        try:
+            if name == "is_ancestor":
+                print("да" if self.is_ancestor(first, second) else "нет")
+            elif name == "merge_base":
+                for sha in self.merge_base(first, second):
+                    print(sha)
+            else:
+                for sha in self.reachable_only(first, second):
+                    print(sha)
+        except ValueError as e:
+            print(e)
+
+    def get_output_file(self):
+        """Файл, в который пишется граф; для png это исходник DOT, удаляемый после отрисовки."""
+        if self.output_format == "png":
+            return self.output_path
+        return f"{self.output_path}.{self.output_format}"
+
+    def open_writer(self):
+        writer_class = WRITERS["dot" if self.output_format == "png" else self.output_format]
+        return writer_class(self.get_output_file())
+
+    def emit(self, node):
+        """Передаёт только что прочитанный коммит писателю, если граф пишется во время обхода."""
+        if self.writer is None:
+            return
+        sha = self.dag.sha(node)
+        self.writer.commit(sha, [self.dag.sha(parent) for parent in self.dag.parent_ids(node)],
+                           self.ref_names.get(sha))
+
+    def iter_commits(self):
+        """Коммиты для записи: (sha, родители, подпись) — весь граф или сокращённый."""
+        if self.is_reduced():
+            return reduce_dag(self.dag, self.starts, max_depth=self.max_depth, first_parent=self.first_parent,
+                              since=self.since, until=self.until, commit_time=self.get_commit_time,
+                              collapse=self.collapse, pinned=self.ref_names)
+        return ((self.dag.sha(node), [self.dag.sha(parent) for parent in self.dag.parent_ids(node)], None)
+                for node in self.dag.order)
+
+    def write_commits(self, writer):
+        for sha, parents, label in self.iter_commits():
+            writer.commit(sha, parents, self.ref_names.get(sha), label)
+
+    def render_image(self):
+        """Отрисовывает записанный DOT в PNG (output_path.png) программой dot."""
+        source = self.get_output_file()
+        graphviz.render("dot", "png", source, outfile=f"{self.output_path}.png")
+        if self.output_format == "png":
+            os.remove(source)
+
+    def build_graph(self):
+        """Записывает собранный граф зависимостей в файл и при необходимости отрисовывает его."""
+        print("Создание графа зависимостей...")
+        with self.open_writer() as writer:
+            self.write_commits(writer)
+        if self.render and self.output_format in ("png", "dot"):
+            self.render_image()
 
     def generate_dependency_graph(self):
         """Главная функция для генерации графа зависимостей."""
@@ -140,22 +622,78 @@ class GitDependencyGraph:
             print("Репозиторий некорректен или повреждён.")
             return
 
-        if self.collect_dependencies():
-            print(f"Зависимости успешно собраны. Создаём граф...")
-            self.build_graph()
-            print(f"Граф зависимостей успешно сохранён в: {self.output_path}.png")
+        # Граф пишется в файл по мере обхода, не накапливаясь в памяти;
+        # сокращённый граф строится по всему собранному графу и пишется после обхода
+        streaming = not self.is_reduced()
+        with self.open_writer() as writer:
+            self.writer = writer if streaming else None
+            try:
+                collected = self.collect_dependencies()
+            finally:
+                self.writer = None
+            if collected and not streaming:
+                self.write_commits(writer)
+
+        if collected:
+            print("Зависимости успешно собраны.")
+            if self.render and self.output_format in ("png", "dot"):
+                print("Отрисовка графа...")
+                self.render_image()
+                print(f"Граф зависимостей успешно сохранён в: {self.output_path}.png")
+            else:
+                print(f"Граф зависимостей успешно сохранён в: {self.get_output_file()}")
         else:
+            os.remove(self.get_output_file())
             print("Не удалось создать граф зависимостей.")
 
 
+def parse_date(text):
+    """Дата ГГГГ-ММ-ДД[ ЧЧ:ММ[:СС]] в секунды Unix (локальное время)."""
+    try:
+        return int(datetime.fromisoformat(text).timestamp())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Некорректная дата: {text}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Генератор графа зависимостей Git.")
     parser.add_argument("-r", "--repo", required=True, help="Путь к анализируемому git-репозиторию.")
     parser.add_argument("-o", "--output", required=True, help="Путь для сохранения изображения графа (без расширения).")
     parser.add_argument("-g", "--graphviz", required=True, help="Путь к программе Graphviz.")
+    parser.add_argument("--no-commit-graph", action="store_true",
+                        help="Не использовать .git/objects/info/commit-graph, читать все коммиты из объектов.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Число потоков распаковки объектов.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Каталог для кэша графа коммитов: повторный запуск читает только новые коммиты.")
+    parser.add_argument("-a", "--all", action="store_true",
+                        help="Обходить все ветки и теги (включая packed-refs), а не только HEAD.")
+    parser.add_argument("-f", "--format", choices=["png", *WRITERS], default="png",
+                        help="Формат результата: png или файл <выходной_файл>.dot/.graphml/.json без отрисовки.")
+    parser.add_argument("--render", action="store_true", help="Для формата dot дополнительно отрисовать PNG.")
+    parser.add_argument("--first-parent", action="store_true", help="Показывать только историю по первым родителям.")
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help="Число уровней истории от стартовых коммитов; более старые коммиты не читаются.")
+    parser.add_argument("--since", type=parse_date, default=None, help="Только коммиты не старше даты (ГГГГ-ММ-ДД).")
+    parser.add_argument("--until", type=parse_date, default=None, help="Только коммиты не новее даты (ГГГГ-ММ-ДД).")
+    parser.add_argument("--collapse", action="store_true",
+                        help="Сворачивать линейные цепочки коммитов в одну вершину.")
+    query = parser.add_mutually_exclusive_group()
+    query.add_argument("--is-ancestor", nargs=2, metavar=("A", "B"), help="Проверить, является ли A предком B.")
+    query.add_argument("--merge-base", nargs=2, metavar=("A", "B"), help="Найти лучших общих предков A и B.")
+    query.add_argument("--only", nargs=2, metavar=("X", "Y"), help="Коммиты, достижимые из X, но не из Y.")
     args = parser.parse_args()
 
-    graph = GitDependencyGraph(args.repo, args.output, args.graphviz)
+    graph = GitDependencyGraph(args.repo, args.output, args.graphviz, use_commit_graph=not args.no_commit_graph,
+                               workers=args.jobs, cache_dir=args.cache_dir, all_refs=args.all,
+                               output_format=args.format, render=args.render, first_parent=args.first_parent,
+                               max_depth=args.max_depth, since=args.since, until=args.until,
+                               collapse=args.collapse)
+    for name in ("is_ancestor", "merge_base", "only"):
+        if getattr(args, name):
+            # Запросу нужны все ветки и теги, а не только история HEAD
+            graph.all_refs = True
+            graph.run_query(name, *getattr(args, name))
+            return
     graph.generate_dependency_graph()
 
 
@@ -0,0 +1,118 @@
+import json
+from abc import ABC, abstractmethod
+from xml.sax.saxutils import escape, quoteattr
+
+
+class GraphWriter(ABC):
+    """Потоковая запись графа коммитов: каждая вершина и её рёбра сразу уходят в файл.
+
+    Писатель не хранит граф, поэтому память не зависит от числа коммитов.
+    """
+
+    extension = ""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8")
+        self.write_header()
+
+    def write_header(self):
+        pass
+
+    def write_footer(self):
+        pass
+
+    @abstractmethod
+    def commit(self, sha, parents, refs=None, label=None):
+        """Записывает коммит, его рёбра к родителям и указывающие на него ссылки.
+
+        label заменяет подпись вершины (например, у сводной вершины цепочки коммитов).
+        """
+
+    def close(self):
+        if not self.file.closed:
+            self.write_footer()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def dot_quote(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+class DotWriter(GraphWriter):
+    """Исходник Graphviz (DOT), который можно отрисовать командой dot."""
+
+    extension = "dot"
+
+    def write_header(self):
+        self.file.write("// Git Dependency Graph\ndigraph {\n")
+
+    def write_footer(self):
+        self.file.write("}\n")
+
+    def commit(self, sha, parents, refs=None, label=None):
+        if label is None:
+            label = sha + "\n" + ", ".join(refs) if refs else sha
+        self.file.write(f"\t{dot_quote(sha)} [label={dot_quote(label)}]\n")
+        for parent in parents:
+            self.file.write(f"\t{dot_quote(sha)} -> {dot_quote(parent)}\n")
+
+
+class GraphMLWriter(GraphWriter):
+    """GraphML: вершины с атрибутами refs и label и направленные рёбра от коммита к родителю."""
+
+    extension = "graphml"
+
+    def write_header(self):
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                        '  <key id="refs" for="node" attr.name="refs" attr.type="string"/>\n'
+                        '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+                        '  <graph id="commits" edgedefault="directed">\n')
+
+    def write_footer(self):
+        self.file.write("  </graph>\n</graphml>\n")
+
+    def commit(self, sha, parents, refs=None, label=None):
+        data = [(key, value) for key, value in (("refs", ", ".join(refs or ())), ("label", label)) if value]
+        if data:
+            self.file.write(f"    <node id={quoteattr(sha)}>")
+            for key, value in data:
+                self.file.write(f'<data key="{key}">{escape(value)}</data>')
+            self.file.write("</node>\n")
+        else:
+            self.file.write(f"    <node id={quoteattr(sha)}/>\n")
+        for parent in parents:
+            self.file.write(f"    <edge source={quoteattr(sha)} target={quoteattr(parent)}/>\n")
+
+
+class JsonEdgeWriter(GraphWriter):
+    """JSON-массив рёбер [коммит, родитель]; корневые коммиты записываются как [коммит, null]."""
+
+    extension = "json"
+
+    def write_header(self):
+        self.file.write("[")
+        self.first = True
+
+    def write_footer(self):
+        self.file.write("\n]\n")
+
+    def write_edge(self, sha, parent):
+        self.file.write(("\n" if self.first else ",\n") + json.dumps([sha, parent]))
+        self.first = False
+
+    def commit(self, sha, parents, refs=None, label=None):
+        if not parents:
+            self.write_edge(sha, None)
+        for parent in parents:
+            self.write_edge(sha, parent)
+
+
+WRITERS = {writer.extension: writer for writer in (DotWriter, GraphMLWriter, JsonEdgeWriter)}
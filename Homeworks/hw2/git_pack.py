@@ -0,0 +1,324 @@
+import os
+import glob
+import mmap
+import zlib
+import struct
+import threading
+from collections import OrderedDict
+
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+TYPE_NAMES = {OBJ_COMMIT: b"commit", OBJ_TREE: b"tree", OBJ_BLOB: b"blob", OBJ_TAG: b"tag"}
+TYPE_CODES = {name: code for code, name in TYPE_NAMES.items()}
+
+IDX_MAGIC = b"\377tOc"
+PACK_MAGIC = b"PACK"
+# Объём кэша распакованных баз для цепочек дельт
+DELTA_CACHE_BYTES = 32 * 1024 * 1024
+INFLATE_CHUNK = 64 * 1024
+# Шаг частичной распаковки: сжатые данные подаются и распаковываются такими порциями
+PREFIX_STEP = 512
+
+
+def map_file(path):
+    """Отображает файл в память только для чтения."""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def inflate_prefix(chunks, terminator):
+    """Распаковывает zlib-поток порциями, пока в результате не встретится terminator.
+
+    Возвращает распакованное начало потока (включая terminator) или весь поток,
+    если terminator не найден. Хвост потока не распаковывается.
+    """
+    decompressor = zlib.decompressobj()
+    result = bytearray()
+    for chunk in chunks:
+        while chunk:
+            search_from = max(len(result) - len(terminator) + 1, 0)
+            result += decompressor.decompress(chunk, PREFIX_STEP)
+            found = result.find(terminator, search_from)
+            if found != -1:
+                return bytes(result[:found + len(terminator)])
+            if decompressor.eof:
+                return bytes(result)
+            chunk = decompressor.unconsumed_tail
+    result += decompressor.flush()
+    return bytes(result)
+
+
+def read_delta_size(delta, pos):
+    """Читает размер в формате переменной длины из заголовка дельты."""
+    size = 0
+    shift = 0
+    while True:
+        byte = delta[pos]
+        pos += 1
+        size |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return size, pos
+
+
+def apply_delta(base, delta):
+    """Восстанавливает объект из базы и дельты (команды copy/insert)."""
+    source_size, pos = read_delta_size(delta, 0)
+    if source_size != len(base):
+        raise ValueError(f"Размер базы {len(base)} не совпадает с ожидаемым {source_size}.")
+    target_size, pos = read_delta_size(delta, pos)
+    result = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            # Копирование фрагмента базы: смещение и длина заданы выбранными байтами
+            offset = 0
+            size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            result += base[offset:offset + (size or 0x10000)]
+        elif op:
+            # Вставка op байт из самой дельты
+            result += delta[pos:pos + op]
+            pos += op
+        else:
+            raise ValueError("Некорректная команда дельты.")
+    if len(result) != target_size:
+        raise ValueError(f"Размер результата {len(result)} не совпадает с ожидаемым {target_size}.")
+    return bytes(result)
+
+
+class PackIndex:
+    """Индекс pack-файла (.idx версий 1 и 2) с бинарным поиском по таблице fanout."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = map_file(path)
+        if self.data[:4] == IDX_MAGIC:
+            self.version = struct.unpack(">I", self.data[4:8])[0]
+            if self.version != 2:
+                raise ValueError(f"Неподдерживаемая версия индекса {self.version}: {path}")
+            fanout_start = 8
+        else:
+            self.version = 1
+            fanout_start = 0
+        self.fanout = struct.unpack(">256I", self.data[fanout_start:fanout_start + 1024])
+        self.count = self.fanout[255]
+        self.names_start = fanout_start + 1024
+        if self.version == 2:
+            self.offsets_start = self.names_start + 24 * self.count  # SHA (20) + CRC32 (4)
+            self.large_offsets_start = self.offsets_start + 4 * self.count
+
+    def sha_at(self, i):
+        """Возвращает 20-байтовый SHA i-й записи."""
+        if self.version == 2:
+            pos = self.names_start + 20 * i
+        else:
+            pos = self.names_start + 24 * i + 4
+        return self.data[pos:pos + 20]
+
+    def offset_at(self, i):
+        """Возвращает смещение i-й записи в pack-файле."""
+        if self.version == 1:
+            pos = self.names_start + 24 * i
+            return struct.unpack(">I", self.data[pos:pos + 4])[0]
+        pos = self.offsets_start + 4 * i
+        offset = struct.unpack(">I", self.data[pos:pos + 4])[0]
+        if offset & 0x80000000:
+            # Старший бит — ссылка в таблицу 64-битных смещений
+            pos = self.large_offsets_start + 8 * (offset & 0x7FFFFFFF)
+            offset = struct.unpack(">Q", self.data[pos:pos + 8])[0]
+        return offset
+
+    def find_offset(self, sha):
+        """Ищет смещение объекта по 20-байтовому SHA или возвращает None."""
+        first = sha[0]
+        lo = self.fanout[first - 1] if first else 0
+        hi = self.fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self.sha_at(mid)
+            if current < sha:
+                lo = mid + 1
+            elif current > sha:
+                hi = mid
+            else:
+                return self.offset_at(mid)
+        return None
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.sha_at(i), self.offset_at(i)
+
+
+class Packfile:
+    """Pack-файл, отображённый в память, с разрешением цепочек OFS_DELTA и REF_DELTA."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = map_file(path)
+        if self.data[:4] != PACK_MAGIC:
+            raise ValueError(f"Файл не является pack-файлом: {path}")
+        # Кэш восстановленных объектов по смещению: база часто общая для многих дельт.
+        # Pack-файл читается из нескольких потоков, поэтому кэш защищён блокировкой
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        self.cache_lock = threading.Lock()
+
+    def read_header(self, offset):
+        """Читает тип и размер объекта; возвращает их и смещение сжатых данных."""
+        byte = self.data[offset]
+        offset += 1
+        obj_type = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        while byte & 0x80:
+            byte = self.data[offset]
+            offset += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+        return obj_type, size, offset
+
+    def inflate(self, offset, size):
+        """Распаковывает zlib-поток, начинающийся со смещения offset."""
+        decompressor = zlib.decompressobj()
+        result = bytearray()
+        # Первый блок с запасом покрывает типичный объект целиком
+        step = size + 256
+        while not decompressor.eof:
+            chunk = self.data[offset:offset + step]
+            if not chunk:
+                raise zlib.error(f"Обрыв сжатых данных в {self.path} по смещению {offset}.")
+            offset += len(chunk)
+            result += decompressor.decompress(chunk)
+            step = INFLATE_CHUNK
+        if len(result) != size:
+            raise zlib.error(f"Размер распакованного объекта {len(result)} не совпадает с {size}.")
+        return bytes(result)
+
+    def read_prefix(self, offset, terminator):
+        """Частично распаковывает объект без дельты до terminator.
+
+        Возвращает (тип, размер, начало данных) или None для дельт,
+        которые без полной базы не восстановить.
+        """
+        obj_type, size, pos = self.read_header(offset)
+        if obj_type not in TYPE_NAMES:
+            return None
+        chunks = (self.data[start:start + PREFIX_STEP] for start in range(pos, len(self.data), PREFIX_STEP))
+        return obj_type, size, inflate_prefix(chunks, terminator)
+
+    def remember(self, offset, obj_type, data):
+        if len(data) > DELTA_CACHE_BYTES // 4:
+            return
+        with self.cache_lock:
+            if offset in self.cache:
+                return
+            self.cache[offset] = (obj_type, data)
+            self.cache_bytes += len(data)
+            while self.cache_bytes > DELTA_CACHE_BYTES:
+                _, (_, evicted) = self.cache.popitem(last=False)
+                self.cache_bytes -= len(evicted)
+
+    def cached(self, offset):
+        with self.cache_lock:
+            found = self.cache.get(offset)
+            if found is not None:
+                self.cache.move_to_end(offset)
+            return found
+
+    def read(self, offset, resolve_ref):
+        """Читает объект по смещению; resolve_ref(sha) даёт базу для REF_DELTA."""
+        chain = []
+        while True:
+            cached = self.cached(offset)
+            if cached is not None:
+                obj_type, data = cached
+                break
+            obj_type, size, pos = self.read_header(offset)
+            if obj_type == OBJ_OFS_DELTA:
+                # Отрицательное смещение базы относительно текущего объекта
+                byte = self.data[pos]
+                pos += 1
+                distance = byte & 0x7F
+                while byte & 0x80:
+                    byte = self.data[pos]
+                    pos += 1
+                    distance = ((distance + 1) << 7) | (byte & 0x7F)
+                chain.append((offset, self.inflate(pos, size)))
+                offset -= distance
+            elif obj_type == OBJ_REF_DELTA:
+                base_sha = self.data[pos:pos + 20]
+                chain.append((offset, self.inflate(pos + 20, size)))
+                base = resolve_ref(base_sha)
+                if base is None:
+                    return None
+                obj_type, data = base
+                break
+            elif obj_type in TYPE_NAMES:
+                data = self.inflate(pos, size)
+                self.remember(offset, obj_type, data)
+                break
+            else:
+                raise ValueError(f"Неизвестный тип объекта {obj_type} в {self.path}.")
+
+        for delta_offset, delta in reversed(chain):
+            data = apply_delta(data, delta)
+            self.remember(delta_offset, obj_type, data)
+        return obj_type, data
+
+
+class PackStore:
+    """Все pack-файлы из .git/objects/pack."""
+
+    def __init__(self, objects_dir, loose_reader=None):
+        self.objects_dir = objects_dir
+        # loose_reader(sha) -> (тип, данные) для баз REF_DELTA, лежащих вне pack-файлов
+        self.loose_reader = loose_reader
+        self.packs = []
+        for idx_path in sorted(glob.glob(os.path.join(objects_dir, "pack", "*.idx"))):
+            pack_path = idx_path[:-4] + ".pack"
+            if os.path.isfile(pack_path):
+                self.packs.append((PackIndex(idx_path), Packfile(pack_path)))
+
+    def find(self, sha):
+        """Возвращает (pack-файл, смещение) для 20-байтового SHA или None."""
+        for index, pack in self.packs:
+            offset = index.find_offset(sha)
+            if offset is not None:
+                return pack, offset
+        return None
+
+    def read(self, sha):
+        """Читает объект по 20-байтовому SHA; возвращает (тип, данные) или None."""
+        found = self.find(sha)
+        if found is None:
+            if self.loose_reader is not None:
+                return self.loose_reader(sha)
+            return None
+        pack, offset = found
+        return pack.read(offset, self.read)
+
+    def read_prefix(self, sha, terminator):
+        """Читает начало объекта до terminator; возвращает (тип, размер, данные) или None."""
+        found = self.find(sha)
+        if found is None:
+            return None
+        pack, offset = found
+        prefix = pack.read_prefix(offset, terminator)
+        if prefix is not None:
+            return prefix
+        # Дельта: восстанавливаем объект целиком
+        obj_type, data = pack.read(offset, self.read)
+        return obj_type, len(data), data
@@ -0,0 +1,131 @@
+import heapq
+from array import array
+
+# Флаги закраски коммитов при обходе
+PARENT1 = 1
+PARENT2 = 2
+STALE = 4
+RESULT = 8
+UNINTERESTING = 16
+REACHABLE = 32
+
+
+class CommitQuery:
+    """Запросы к собранному графу коммитов без повторного чтения репозитория.
+
+    Для каждого коммита один раз вычисляется номер поколения: 1 + максимум по родителям
+    (у коммита без прочитанных родителей — 1). Потомок всегда старше по поколению, чем
+    предок, поэтому обход в порядке убывания поколения останавливается, как только
+    оставшиеся коммиты не могут повлиять на ответ.
+    """
+
+    def __init__(self, dag):
+        self.dag = dag
+        self.generations = self.compute_generations()
+
+    def compute_generations(self):
+        """Поколения всех коммитов графа итеративным обходом в глубину (без рекурсии)."""
+        dag = self.dag
+        generations = array("I", bytes(4 * len(dag.starts)))
+        for root in dag.order:
+            if generations[root]:
+                continue
+            stack = [root]
+            while stack:
+                node = stack[-1]
+                if generations[node]:
+                    stack.pop()
+                    continue
+                pending = [parent for parent in dag.parent_ids(node) if not generations[parent]]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                generations[node] = 1 + max((generations[parent] for parent in dag.parent_ids(node)), default=0)
+        return generations
+
+    def node(self, sha):
+        node = self.dag.find(sha)
+        if node is None or not self.dag.is_visited(node):
+            raise ValueError(f"Коммит {sha} не найден в графе.")
+        return node
+
+    def generation(self, sha):
+        return self.generations[self.node(sha)]
+
+    def is_ancestor(self, ancestor, descendant):
+        """Достижим ли ancestor из descendant (коммит считается предком самого себя)."""
+        target = self.node(ancestor)
+        start = self.node(descendant)
+        # Коммиты с поколением не выше, чем у искомого, кроме него самого, не ведут к нему
+        floor = self.generations[target]
+        seen = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            if node == target:
+                return True
+            for parent in self.dag.parent_ids(node):
+                if parent not in seen and (self.generations[parent] > floor or parent == target):
+                    seen.add(parent)
+                    stack.append(parent)
+        return False
+
+    def merge_bases(self, first, second):
+        """Лучшие общие предки двух коммитов (как git merge-base --all)."""
+        a, b = self.node(first), self.node(second)
+        if a == b:
+            return [first]
+        flags = {a: PARENT1, b: PARENT2}
+        queue = [(-self.generations[a], a), (-self.generations[b], b)]
+        heapq.heapify(queue)
+        results = []
+        # Обход в порядке убывания поколения: к моменту извлечения коммита все его
+        # потомки из обеих историй уже обработаны и его флаги окончательны
+        while any(not flags[node] & STALE for _, node in queue):
+            _, node = heapq.heappop(queue)
+            current = flags[node] & (PARENT1 | PARENT2 | STALE)
+            if current == PARENT1 | PARENT2:
+                if not flags[node] & RESULT:
+                    flags[node] |= RESULT
+                    results.append(node)
+                # Предки общего коммита — не лучшие общие предки
+                current |= STALE
+            for parent in self.dag.parent_ids(node):
+                if flags.get(parent, 0) & current == current:
+                    continue
+                flags[parent] = flags.get(parent, 0) | current
+                heapq.heappush(queue, (-self.generations[parent], parent))
+
+        # Убираем найденные общие предки, которые являются предками других найденных
+        bases = []
+        for node in results:
+            sha = self.dag.sha(node)
+            if not any(other != node and self.is_ancestor(sha, self.dag.sha(other)) for other in results):
+                bases.append(sha)
+        return bases
+
+    def only(self, include, exclude):
+        """Коммиты, достижимые из include, но не из exclude (как git rev-list include ^exclude)."""
+        start, stop = self.node(include), self.node(exclude)
+        flags = {start: REACHABLE}
+        flags[stop] = flags.get(stop, 0) | UNINTERESTING
+        queue = [(-self.generations[node], node) for node in flags]
+        heapq.heapify(queue)
+        result = []
+        # Коммит извлекается после всех своих потомков, поэтому флаг UNINTERESTING окончателен;
+        # обход останавливается, когда в очереди не осталось интересных коммитов
+        while any(not flags[node] & UNINTERESTING for _, node in queue):
+            _, node = heapq.heappop(queue)
+            current = flags[node]
+            if current & UNINTERESTING:
+                current = UNINTERESTING
+            elif current & REACHABLE:
+                result.append(node)
+                current = REACHABLE
+            for parent in self.dag.parent_ids(node):
+                if flags.get(parent, 0) & current:
+                    continue
+                flags[parent] = flags.get(parent, 0) | current
+                heapq.heappush(queue, (-self.generations[parent], parent))
+        return [self.dag.sha(node) for node in result]
@@ -0,0 +1,95 @@
+from array import array
+
+# Состояния коммита в проходе сокращения
+UNSEEN = 0
+SEEN = 1  # достигнут обходом, но не попадает в результат (вне диапазона дат)
+KEPT = 2
+
+
+def reduce_dag(dag, starts, max_depth=None, first_parent=False, since=None, until=None,
+               commit_time=None, collapse=False, pinned=()):
+    """Сокращает граф коммитов для отрисовки.
+
+    Один обход в ширину от starts отбирает коммиты: не глубже max_depth уровней
+    (стартовые коммиты — уровень 0), только по первым родителям при first_parent,
+    с временем коммита commit_time(sha) в диапазоне [since, until]. Коммиты старше
+    since не продолжают обход; более новые, чем until, пропускаются, но обход идёт дальше.
+    При collapse линейные цепочки (один родитель и один потомок, нет ссылок из pinned)
+    заменяются одной сводной вершиной.
+
+    Возвращает генератор (sha, родители, подпись или None) в порядке обхода.
+    """
+    state = bytearray(len(dag.starts))
+    frontier = []
+    for sha in starts:
+        node = dag.find(sha)
+        if node is not None and dag.is_visited(node) and not state[node]:
+            state[node] = SEEN
+            frontier.append(node)
+
+    use_dates = commit_time is not None and (since is not None or until is not None)
+    kept = array("I")
+    level = 0
+    while frontier and (max_depth is None or level < max_depth):
+        next_frontier = []
+        for node in frontier:
+            time = commit_time(dag.sha(node)) if use_dates else None
+            if time is not None and since is not None and time < since:
+                continue
+            if time is None or until is None or time <= until:
+                state[node] = KEPT
+                kept.append(node)
+            for parent in select_parents(dag, node, first_parent):
+                if not state[parent] and dag.is_visited(parent):
+                    state[parent] = SEEN
+                    next_frontier.append(parent)
+        frontier = next_frontier
+        level += 1
+
+    def kept_parents(node):
+        return [parent for parent in select_parents(dag, node, first_parent) if state[parent] == KEPT]
+
+    if not collapse:
+        return ((dag.sha(node), [dag.sha(parent) for parent in kept_parents(node)], None) for node in kept)
+
+    # Число сохранённых потомков (достаточно знать 0, 1 или «больше одного»)
+    children = bytearray(len(dag.starts))
+    for node in kept:
+        for parent in kept_parents(node):
+            if children[parent] < 2:
+                children[parent] += 1
+    pinned_nodes = {dag.find(sha) for sha in pinned}
+
+    def is_inner(node):
+        return children[node] == 1 and node not in pinned_nodes and len(kept_parents(node)) == 1
+
+    return collapse_chains(dag, kept, kept_parents, is_inner)
+
+
+def select_parents(dag, node, first_parent):
+    parents = dag.parent_ids(node)
+    return parents[:1] if first_parent else parents
+
+
+def collapse_chains(dag, kept, kept_parents, is_inner):
+    """Выдаёт вершины, не лежащие внутри цепочек; каждая цепочка выдаётся вместе со своим потомком."""
+    for node in kept:
+        if is_inner(node):
+            continue
+        chains = []
+        parents = []
+        for parent in kept_parents(node):
+            chain = [parent]
+            while is_inner(chain[-1]):
+                chain.append(kept_parents(chain[-1])[0])
+            # Последний элемент — первая вершина вне цепочки
+            inner, below = chain[:-1], chain[-1]
+            if inner:
+                chains.append((inner, below))
+            parents.append(dag.sha(chain[0]))
+        yield dag.sha(node), parents, None
+        for inner, below in chains:
+            newest, oldest = dag.sha(inner[0]), dag.sha(inner[-1])
+            # Цепочка из одного коммита выдаётся как обычная вершина
+            label = f"{newest[:7]}..{oldest[:7]}\n(коммитов: {len(inner)})" if len(inner) > 1 else None
+            yield newest, [dag.sha(below)], label
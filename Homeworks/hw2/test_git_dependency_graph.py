@@ -1,7 +1,18 @@
 import unittest
 import os
+import glob
 import shutil
+import tempfile
+import subprocess
+import zlib
+import json
+import xml.etree.ElementTree as ElementTree
 from git_dependency_graph import GitDependencyGraph
+from git_pack import apply_delta
+from git_dag import CommitDag, DependencyView
+from git_dag_cache import load_dag_cache, save_dag_cache
+from git_query import CommitQuery
+from benchmark import generate_repository, TOPOLOGIES, START_TIME
 
 
 class TestGitDependencyGraph(unittest.TestCase):
@@ -65,6 +76,12 @@ class TestGitDependencyGraph(unittest.TestCase):
         parents = self.graph.parse_commit(commit_data)
         self.assertEqual(parents, ["abcdef1234567890"])
 
+    def test_parse_commit_merge_headers(self):
+        """Тестирует разбор нескольких родителей и остановку на конце заголовков."""
+        commit_data = (b"commit 200\0tree 1111\nparent aaaa\nparent bbbb\nauthor A <a@a> 0 +0000\n\n"
+                       b"parent cccc in message\n")
+        self.assertEqual(self.graph.parse_commit(commit_data), ["aaaa", "bbbb"])
+
     def test_collect_dependencies(self):
         """Тестирует сбор зависимостей."""
         result = self.graph.collect_dependencies()
@@ -99,5 +116,427 @@ class TestGitDependencyGraph(unittest.TestCase):
         self.assertEqual(graph.graphviz_path, graphviz_path)
 
 
+class TestCommitDag(unittest.TestCase):
+    def test_interning_and_edges(self):
+        """Тестирует интернирование SHA и хранение рёбер в общих массивах."""
+        a, b, c = "a" * 40, "b" * 40, "c" * 40
+        dag = CommitDag()
+        dag.add(a, [b, c])
+        dag.add(b, [c])
+        dag.add(c, [])
+        self.assertEqual(len(dag.oids), 20 * 3)
+        self.assertEqual(list(dag.edges), [dag.find(b), dag.find(c), dag.find(c)])
+        self.assertEqual(dag.parents(a), [b, c])
+        self.assertEqual(dag.sha(dag.find(c)), c)
+
+    def test_dependency_view(self):
+        """Тестирует словарное представление графа, включая SHA не в формате hex."""
+        view = DependencyView(CommitDag())
+        view["a" * 40] = ["not-a-sha"]
+        self.assertIn("a" * 40, view)
+        # Родитель известен графу, но не прочитан
+        self.assertNotIn("not-a-sha", view)
+        self.assertEqual(view, {"a" * 40: ["not-a-sha"]})
+        with self.assertRaises(KeyError):
+            view["b" * 40]
+
+    def test_cache_round_trip(self):
+        """Тестирует кэш графа: загрузка в CommitDag и сохранение из массивов с дополнением прошлого кэша."""
+        a, b, c, d = "a" * 40, "b" * 40, "c" * 40, "d" * 40
+        cached = CommitDag()
+        cached.add(b, [c])
+        cached.add(c, [])
+        current = CommitDag()
+        current.set_time(current.add(a, [b]), 1700000000)
+        current.add(b, [c])
+        current.add(d, ["not-a-sha"])  # не сохраняется
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = os.path.join(cache_dir, "repo.dag")
+            save_dag_cache(path, "repo", current, base=cached)
+            loaded = load_dag_cache(path, "repo")
+        self.assertIsInstance(loaded, CommitDag)
+        self.assertEqual(DependencyView(loaded), {c: [], a: [b], b: [c]})
+        self.assertEqual(loaded.commit_time(loaded.find(a)), 1700000000)
+        self.assertIsNone(loaded.commit_time(loaded.find(b)))
+
+
+class TestCommitQuery(unittest.TestCase):
+    def setUp(self):
+        """Граф: две ветки от общего коммита b, слияние m и «перекрёстное» слияние x."""
+        self.shas = {name: name * 40 for name in "abcdefmx"}
+        s = self.shas
+        self.dag = CommitDag()
+        for sha, parents in ((s["m"], [s["d"], s["e"]]), (s["x"], [s["e"], s["d"]]), (s["d"], [s["c"]]),
+                             (s["c"], [s["b"]]), (s["e"], [s["b"]]), (s["f"], [s["a"]]),
+                             (s["b"], [s["a"]]), (s["a"], [])):
+            self.dag.add(sha, parents)
+        self.query = CommitQuery(self.dag)
+
+    def test_generations(self):
+        s = self.shas
+        self.assertEqual([self.query.generation(s[name]) for name in "abcdm"], [1, 2, 3, 4, 5])
+        self.assertEqual(self.query.generation(s["e"]), 3)
+
+    def test_is_ancestor(self):
+        s = self.shas
+        self.assertTrue(self.query.is_ancestor(s["b"], s["m"]))
+        self.assertTrue(self.query.is_ancestor(s["m"], s["m"]))
+        self.assertFalse(self.query.is_ancestor(s["c"], s["e"]))
+        self.assertFalse(self.query.is_ancestor(s["m"], s["b"]))
+        with self.assertRaises(ValueError):
+            self.query.is_ancestor("0" * 40, s["m"])
+
+    def test_merge_bases(self):
+        s = self.shas
+        self.assertEqual(self.query.merge_bases(s["c"], s["e"]), [s["b"]])
+        self.assertEqual(self.query.merge_bases(s["b"], s["m"]), [s["b"]])
+        self.assertEqual(self.query.merge_bases(s["f"], s["m"]), [s["a"]])
+        # Перекрёстные слияния: два лучших общих предка
+        self.assertEqual(sorted(self.query.merge_bases(s["m"], s["x"])), sorted([s["d"], s["e"]]))
+
+    def test_only(self):
+        s = self.shas
+        self.assertEqual(sorted(self.query.only(s["m"], s["e"])), sorted([s["m"], s["d"], s["c"]]))
+        self.assertEqual(self.query.only(s["b"], s["m"]), [])
+        self.assertEqual(sorted(self.query.only(s["f"], s["c"])), [s["f"]])
+
+
+@unittest.skipUnless(shutil.which("git"), "git не установлен")
+class TestPackedRepository(unittest.TestCase):
+    def setUp(self):
+        """Создаёт настоящий репозиторий git с несколькими коммитами и ветвлением."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repo = self.temp_dir.name
+        self.git("init", "-q", "-b", "master")
+        content = "".join(f"line {i}\n" for i in range(200))
+        for i in range(4):
+            content += f"change {i}\n"
+            with open(os.path.join(self.repo, "file.txt"), "w") as f:
+                f.write(content)
+            self.git("add", "file.txt")
+            self.git("commit", "-q", "-m", f"commit {i}")
+        self.git("checkout", "-q", "-b", "side", "HEAD~2")
+        self.git("commit", "-q", "--allow-empty", "-m", "side")
+        self.git("checkout", "-q", "master")
+        self.git("merge", "-q", "--no-edit", "side")
+        self.graph = GitDependencyGraph(self.repo, os.path.join(self.repo, "graph"), "/usr/bin")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def git(self, *args, stdin=None):
+        env = dict(os.environ, GIT_AUTHOR_NAME="t", GIT_AUTHOR_EMAIL="t@t", GIT_COMMITTER_NAME="t",
+                   GIT_COMMITTER_EMAIL="t@t", GIT_CONFIG_GLOBAL=os.devnull, GIT_CONFIG_NOSYSTEM="1")
+        return subprocess.run(["git", *args], cwd=self.repo, env=env, input=stdin, check=True,
+                              capture_output=True).stdout
+
+    def expected_dependencies(self, *revs):
+        lines = self.git("rev-list", "--parents", *(revs or ["HEAD"])).decode().splitlines()
+        return {line.split()[0]: line.split()[1:] for line in lines}
+
+    def loose_objects(self):
+        return glob.glob(os.path.join(self.repo, ".git", "objects", "??", "*"))
+
+    def assert_objects_match_git(self):
+        for line in self.git("rev-list", "--objects", "--all").decode().splitlines():
+            sha = line.split()[0]
+            obj_type = self.git("cat-file", "-t", sha).strip()
+            body = self.git("cat-file", obj_type.decode(), sha)
+            self.assertEqual(self.graph.read_object(sha), obj_type + b" %d\0" % len(body) + body)
+
+    def test_collect_dependencies_from_packs(self):
+        """Тестирует обход истории, полностью лежащей в pack-файлах (OFS_DELTA)."""
+        self.git("repack", "-q", "-a", "-d", "-f", "--window=50")
+        self.git("prune-packed")
+        self.assertEqual(self.loose_objects(), [])
+        self.assertTrue(self.graph.collect_dependencies())
+        self.assertEqual(self.graph.dependencies, self.expected_dependencies())
+        self.assert_objects_match_git()
+
+    def test_read_ref_delta_objects(self):
+        """Тестирует восстановление объектов из цепочек REF_DELTA."""
+        objects = self.git("rev-list", "--objects", "--all")
+        pack_dir = os.path.join(self.repo, ".git", "objects", "pack")
+        os.makedirs(pack_dir, exist_ok=True)
+        # Без --delta-base-offset git записывает дельты как REF_DELTA
+        self.git("pack-objects", "-q", os.path.join(pack_dir, "pack"), stdin=objects)
+        self.git("prune-packed")
+        self.assertEqual(self.loose_objects(), [])
+        self.assert_objects_match_git()
+
+    def test_commit_graph_parents_without_reading_objects(self):
+        """Тестирует чтение родителей из commit-graph и откат к объектам для новых коммитов."""
+        self.git("commit-graph", "write", "--reachable")
+        self.git("commit", "-q", "--allow-empty", "-m", "not in graph")
+        read = []
+        original_read = self.graph.read_commit_header
+        self.graph.read_commit_header = lambda sha: read.append(sha) or original_read(sha)
+
+        self.assertTrue(self.graph.collect_dependencies())
+        self.assertEqual(self.graph.dependencies, self.expected_dependencies())
+        self.assertEqual(read, [self.git("rev-parse", "HEAD").decode().strip()])
+
+    def test_split_commit_graph_chain(self):
+        """Тестирует цепочку слоёв commit-graph (--split)."""
+        self.git("commit-graph", "write", "--reachable", "--split")
+        self.git("commit", "-q", "--allow-empty", "-m", "second layer")
+        self.git("commit-graph", "write", "--reachable", "--split=no-merge")
+        graph = self.graph.get_commit_graph()
+        self.assertEqual(len(graph.layers), 2)
+        expected = self.expected_dependencies()
+        for sha, parents in expected.items():
+            self.assertEqual(graph.parents_of(sha), parents)
+        # Поколение вершины на единицу больше максимального поколения родителей
+        head = self.git("rev-parse", "HEAD").decode().strip()
+        position = graph.lookup(bytes.fromhex(head))
+        self.assertEqual(graph.generation(position), len(self.git("rev-list", "--first-parent", "HEAD").split()))
+
+    def test_read_commit_header_skips_message(self):
+        """Тестирует частичную распаковку коммита с очень длинным сообщением."""
+        message = b"x" * 200000
+        self.git("commit", "-q", "--allow-empty", "-F", "-", stdin=message)
+        head = self.git("rev-parse", "HEAD").decode().strip()
+        parent = self.git("rev-parse", "HEAD~1").decode().strip()
+        for packed in (False, True):
+            if packed:
+                self.git("repack", "-q", "-a", "-d")
+                self.git("prune-packed")
+                self.graph = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin")
+            header = self.graph.read_commit_header(head)
+            self.assertTrue(header.startswith(b"commit "))
+            self.assertTrue(header.endswith(b"\n\n"))
+            self.assertLess(len(header), 4096)
+            self.assertEqual(self.graph.parse_commit(header), [parent])
+            self.assertEqual(self.graph.parse_commit(self.graph.read_object(head)), [parent])
+
+    def test_parallel_walk_matches_sequential(self):
+        """Тестирует параллельный обход по фронтам на упакованном и неупакованном репозитории."""
+        expected = self.expected_dependencies()
+        for packed in (False, True):
+            if packed:
+                self.git("repack", "-q", "-a", "-d")
+                self.git("prune-packed")
+            graph = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin", workers=4, max_in_flight=2)
+            self.assertTrue(graph.collect_dependencies())
+            self.assertEqual(graph.dependencies, expected)
+
+    def test_dag_cache_reads_only_new_commits(self):
+        """Тестирует повторный запуск с кэшем: читаются только новые коммиты."""
+        cache_dir = os.path.join(self.repo, "cache")
+        first = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin", cache_dir=cache_dir)
+        self.assertTrue(first.collect_dependencies())
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        self.git("commit", "-q", "--allow-empty", "-m", "new")
+        second = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin", cache_dir=cache_dir)
+        read = []
+        original_read = second.read_commit_header
+        second.read_commit_header = lambda sha: read.append(sha) or original_read(sha)
+        self.assertTrue(second.collect_dependencies())
+        self.assertEqual(second.dependencies, self.expected_dependencies())
+        self.assertEqual(read, [self.git("rev-parse", "HEAD").decode().strip()])
+
+        # После отката HEAD закэшированный, но недостижимый коммит в результат не попадает
+        self.git("reset", "-q", "--hard", "HEAD~1")
+        third = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin", cache_dir=cache_dir)
+        self.assertTrue(third.collect_dependencies())
+        self.assertEqual(third.dependencies, self.expected_dependencies())
+
+    def test_all_refs_with_packed_refs(self):
+        """Тестирует обход всех веток и тегов, упакованных в packed-refs."""
+        self.git("checkout", "-q", "-b", "topic", "HEAD~3")
+        self.git("commit", "-q", "--allow-empty", "-m", "topic")
+        self.git("tag", "-a", "-m", "release", "v1", "HEAD~1")
+        self.git("checkout", "-q", "master")
+        self.git("pack-refs", "--all")
+        self.assertFalse(os.path.exists(os.path.join(self.repo, ".git", "refs", "heads", "master")))
+
+        # HEAD разрешается через packed-refs
+        self.assertTrue(self.graph.collect_dependencies())
+        self.assertEqual(self.graph.dependencies, self.expected_dependencies())
+
+        # Неупакованный аннотированный тег разворачивается по заголовку объекта тега
+        self.git("tag", "-a", "-m", "topic release", "v2", "topic")
+        graph = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin", all_refs=True)
+        read = []
+        original_read = graph.read_commit_header
+        graph.read_commit_header = lambda sha: read.append(sha) or original_read(sha)
+        self.assertTrue(graph.collect_dependencies())
+        self.assertEqual(graph.dependencies, self.expected_dependencies("--all"))
+
+        topic = self.git("rev-parse", "topic").decode().strip()
+        tagged = self.git("rev-parse", "v1^{commit}").decode().strip()
+        self.assertEqual(graph.ref_names[topic], ["refs/heads/topic", "refs/tags/v2"])
+        self.assertEqual(graph.ref_names[tagged], ["refs/tags/v1"])
+        self.assertIn("refs/heads/master", graph.ref_names[self.git("rev-parse", "HEAD").decode().strip()])
+        # Общая история веток читается один раз
+        self.assertEqual(sorted(set(read) & set(graph.dependencies)), sorted(graph.dependencies))
+        self.assertEqual(len(read), len(set(read)))
+
+    def test_streaming_output_formats(self):
+        """Тестирует запись графа в DOT, GraphML и JSON во время обхода, без отрисовки."""
+        expected = self.expected_dependencies()
+        edges = {(sha, parent) for sha, parents in expected.items() for parent in parents}
+        output_path = os.path.join(self.repo, "graph")
+        for output_format in ("dot", "graphml", "json"):
+            with self.subTest(output_format=output_format):
+                graph = GitDependencyGraph(self.repo, output_path, "/usr/bin", output_format=output_format)
+                graph.generate_dependency_graph()
+                self.assertFalse(os.path.exists(output_path + ".png"))
+                with open(f"{output_path}.{output_format}", encoding="utf-8") as f:
+                    content = f.read()
+                if output_format == "dot":
+                    written = {tuple(line.strip().replace('"', "").split(" -> "))
+                               for line in content.splitlines() if "->" in line}
+                    self.assertIn("HEAD", content)
+                elif output_format == "graphml":
+                    root = ElementTree.fromstring(content)
+                    written = {(edge.get("source"), edge.get("target")) for edge in root.iter()
+                               if edge.tag.endswith("edge")}
+                    self.assertEqual(len([node for node in root.iter() if node.tag.endswith("}node")]),
+                                     len(expected))
+                else:
+                    pairs = json.loads(content)
+                    written = {tuple(pair) for pair in pairs if pair[1] is not None}
+                    self.assertEqual({sha for sha, parent in pairs if parent is None},
+                                     {sha for sha, parents in expected.items() if not parents})
+                self.assertEqual(written, edges)
+
+    def reduced(self, **options):
+        graph = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin", **options)
+        self.assertTrue(graph.collect_dependencies())
+        return graph, {sha: (parents, label) for sha, parents, label in graph.iter_commits()}
+
+    def test_reduction_modes(self):
+        """Тестирует первых родителей, ограничение глубины и свёртку линейных цепочек."""
+        rev = {name: self.git("rev-parse", name).decode().strip()
+               for name in ("HEAD", "HEAD^1", "HEAD^2", "HEAD~2", "HEAD~3", "HEAD~4")}
+        merge, c3, side, c2, c1, c0 = (rev[name] for name in ("HEAD", "HEAD^1", "HEAD^2", "HEAD~2", "HEAD~3", "HEAD~4"))
+
+        _, commits = self.reduced(first_parent=True)
+        self.assertEqual(commits, {merge: ([c3], None), c3: ([c2], None), c2: ([c1], None),
+                                   c1: ([c0], None), c0: ([], None)})
+
+        # Глубже второго уровня коммиты не читаются
+        read = []
+        graph = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin", max_depth=2)
+        original_read = graph.read_commit_header
+        graph.read_commit_header = lambda sha: read.append(sha) or original_read(sha)
+        self.assertTrue(graph.collect_dependencies())
+        self.assertEqual(sorted(read), sorted([merge, c3, side]))
+        self.assertEqual({sha: parents for sha, parents, _ in graph.iter_commits()},
+                         {merge: [c3, side], c3: [], side: []})
+
+        _, commits = self.reduced(collapse=True)
+        self.assertEqual(set(commits), {merge, c3, side, c1, c0})
+        self.assertEqual(commits[merge], ([c3, side], None))
+        self.assertEqual(commits[c3][0], [c1])
+        self.assertIn("(коммитов: 2)", commits[c3][1])
+        self.assertEqual(commits[side], ([c1], None))
+
+        _, commits = self.reduced(collapse=True, first_parent=True)
+        self.assertEqual(commits[c3][0], [c0])
+        self.assertIn("(коммитов: 3)", commits[c3][1])
+
+    def test_reduction_by_date(self):
+        """Тестирует отбор коммитов по времени из заголовков и из commit-graph."""
+        head = self.git("rev-parse", "HEAD").decode().strip()
+        head_time = int(self.git("show", "-s", "--format=%ct", "HEAD"))
+        self.assertEqual(self.graph.get_commit_time(head), head_time)
+        self.git("commit-graph", "write", "--reachable")
+        graph = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin")
+        self.assertEqual(graph.get_commit_time(head), head_time)
+
+        _, commits = self.reduced(since=head_time)
+        self.assertEqual(set(commits), set(self.expected_dependencies()))
+        _, commits = self.reduced(since=head_time + 1)
+        self.assertEqual(commits, {})
+        _, commits = self.reduced(until=head_time - 1)
+        self.assertEqual(commits, {})
+
+    def test_queries_match_git(self):
+        """Тестирует запросы через GitDependencyGraph по именам веток и сокращённым SHA."""
+        self.git("checkout", "-q", "-b", "topic", "HEAD~3")
+        self.git("commit", "-q", "--allow-empty", "-m", "topic")
+        self.git("checkout", "-q", "master")
+        graph = GitDependencyGraph(self.repo, self.graph.output_path, "/usr/bin", all_refs=True)
+        self.assertTrue(graph.collect_dependencies())
+
+        def rev_list(*args):
+            return sorted(self.git("rev-list", *args).decode().split())
+
+        self.assertEqual(graph.merge_base("master", "topic"), rev_list("-1", "HEAD~3"))
+        self.assertEqual(graph.resolve_commit("HEAD^2~1"), self.git("rev-parse", "HEAD^2~1").decode().strip())
+        self.assertEqual(sorted(graph.reachable_only("master", "topic")), rev_list("master", "^topic"))
+        self.assertEqual(sorted(graph.reachable_only("topic", "HEAD")), rev_list("topic", "^HEAD"))
+        side = self.git("rev-parse", "--short", "side").decode().strip()
+        self.assertTrue(graph.is_ancestor(side, "master"))
+        self.assertFalse(graph.is_ancestor("topic", "side"))
+        with self.assertRaises(ValueError):
+            graph.merge_base("missing", "master")
+
+    def test_apply_delta(self):
+        """Тестирует применение дельты с командами копирования и вставки."""
+        base = b"hello world"
+        # Размеры 11 -> 12, копирование 6 байт с 0, вставка b"there!"
+        delta = bytes([11, 12, 0x90, 6, 6]) + b"there!"
+        self.assertEqual(apply_delta(base, delta), b"hello there!")
+
+
+@unittest.skipUnless(shutil.which("git"), "git не установлен")
+class TestSyntheticRepository(unittest.TestCase):
+    def test_generated_repositories_match_git(self):
+        """Тестирует генератор синтетических репозиториев для бенчмарка: git принимает их, граф совпадает."""
+        for topology in TOPOLOGIES:
+            for storage in ("loose", "packed"):
+                with self.subTest(topology=topology, storage=storage), tempfile.TemporaryDirectory() as repo:
+                    head = generate_repository(repo, topology, 300, storage)
+                    subprocess.run(["git", "fsck", "--strict", "--no-dangling"], cwd=repo, check=True,
+                                   capture_output=True)
+                    lines = subprocess.run(["git", "rev-list", "--parents", "HEAD"], cwd=repo, check=True,
+                                           capture_output=True).stdout.decode().splitlines()
+                    graph = GitDependencyGraph(repo, os.path.join(repo, "graph"), "/usr/bin")
+                    self.assertTrue(graph.collect_dependencies())
+                    self.assertEqual(graph.starts, [head])
+                    self.assertEqual(graph.dependencies, {line.split()[0]: line.split()[1:] for line in lines})
+
+    def test_since_limits_walk(self):
+        """Тестирует, что since останавливает обход и заголовок каждого коммита читается один раз."""
+        with tempfile.TemporaryDirectory() as repo:
+            generate_repository(repo, "linear", 500, "loose")
+            for workers in (1, 4):
+                with self.subTest(workers=workers):
+                    graph = GitDependencyGraph(repo, os.path.join(repo, "graph"), "/usr/bin", workers=workers,
+                                               since=START_TIME + 400)
+                    read = []
+                    original_read = graph.read_commit_header
+                    graph.read_commit_header = lambda sha: read.append(sha) or original_read(sha)
+                    self.assertTrue(graph.collect_dependencies())
+                    # 100 коммитов в диапазоне и первый более старый, на котором обход остановился
+                    self.assertEqual(len(read), 101)
+                    self.assertEqual(len(list(graph.iter_commits())), 100)
+                    self.assertEqual(len(read), 101)
+
+    def test_warm_cache_keeps_commit_times(self):
+        """Тестирует, что с заполненным кэшем since и until не читают заголовки коммитов."""
+        with tempfile.TemporaryDirectory() as repo:
+            generate_repository(repo, "linear", 500, "loose")
+            cache_dir = os.path.join(repo, "cache")
+            cold = GitDependencyGraph(repo, os.path.join(repo, "graph"), "/usr/bin", cache_dir=cache_dir)
+            self.assertTrue(cold.collect_dependencies())
+            for dates in ({"since": START_TIME + 400}, {"until": START_TIME + 100}):
+                with self.subTest(**dates):
+                    graph = GitDependencyGraph(repo, os.path.join(repo, "graph"), "/usr/bin",
+                                               cache_dir=cache_dir, **dates)
+                    read = []
+                    original_read = graph.read_commit_header
+                    graph.read_commit_header = lambda sha: read.append(sha) or original_read(sha)
+                    self.assertTrue(graph.collect_dependencies())
+                    expected = GitDependencyGraph(repo, os.path.join(repo, "graph"), "/usr/bin", **dates)
+                    self.assertTrue(expected.collect_dependencies())
+                    self.assertEqual(list(graph.iter_commits()), list(expected.iter_commits()))
+                    self.assertEqual(read, [])
+
+
 if __name__ == "__main__":
     unittest.main()
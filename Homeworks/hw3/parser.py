@@ -1,152 +1,495 @@
+import os
 import sys
 import re
+import operator
+import functools
 import toml
+from collections import namedtuple
 
 
-def parse_file(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-
-    data = {}
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith("'") or line.startswith("#"):
-            continue  # Пропускаем пустые строки и комментарии
-
-        # Обработка синтаксиса: <function>(...) -> имя;
-        match = re.match(r'([\w]+)\((.+)\)\s*->\s*(\w+);', line)
-        if match:
-            func, content, name = match.groups()
-            if func == 'pow':
-                # Evaluate power function
-                base, exp = map(int, content.split(','))
-                data[name] = pow(base, exp)
-            else:
-                # Interpret any other function call as an array
-                data[name] = parse_array(content, data)
-            continue
-
-        # Обработка выражений: {выражение} -> имя;
-        match = re.match(r'\{(.+)\}\s*->\s*(\w+);', line)
-        if match:
-            expr, name = match.groups()
-            data[name] = eval_constant_expression("{" + expr + "}", data)
-            continue
-
-        # Обработка констант: значение -> имя;
-        match = re.match(r'(\d+)\s*->\s*(\w+);', line)
-        if match:
-            value, name = match.groups()
-            data[name] = int(value)
-            continue
-
-        # Вывод ошибок для неподдерживаемого синтаксиса
-        raise SyntaxError(f"Syntax error: {line}")
-
-    return data
-
-
-def eval_expression(expr, data):
-    """Оценивает значение выражения или возвращает ссылку на данные."""
-    if expr.isdigit():
-        return int(expr)
-    elif expr.startswith("'") and expr.endswith("'"):
-        # Возвращаем строку в кавычках как есть
-        return expr
-    elif expr.startswith("{") and expr.endswith("}"):
-        return eval_constant_expression(expr, data)
-    elif "(" in expr and ")" in expr:  # Обрабатываем вложенные массивы
-        func_name = expr[:expr.index("(")]
-        if func_name == "pow":
-            args = expr[expr.index("(")+1:expr.index(")")].split(",")
-            return pow(int(args[0]), int(args[1]))
+# Лексема после необязательных пробелов: число, строка в одинарных кавычках, имя, стрелка или знак;
+# третья группа ловит любой другой непробельный символ. Совпадения идут подряд без пропусков
+TOKEN_PATTERN = re.compile(r"(\s*)(?:(\d+|'[^']*'|[^\W\d]\w*|->|[-+*/(){},;])|(\S))")
+# Текст лексемы «конец входа»
+END = ""
+
+# Узлы синтаксического дерева; line и column — позиция начала узла во входном файле
+Number = namedtuple("Number", "value line column")
+String = namedtuple("String", "value line column")
+Name = namedtuple("Name", "name line column")
+Call = namedtuple("Call", "func args line column")
+Expression = namedtuple("Expression", "tokens line column")
+Binding = namedtuple("Binding", "value name line column")
+
+
+def syntax_error(message, line, column):
+    return SyntaxError(f"Syntax error at line {line}, column {column}: {message}")
+
+
+def is_comment(line):
+    """Пустая строка или комментарий (начинается с ' или #)."""
+    stripped = line.lstrip()
+    return not stripped or stripped[0] in "'#"
+
+
+def tokenize_line(line, line_number):
+    """Разбивает строку входа на лексемы: возвращает (тексты лексем, их столбцы)."""
+    values = []
+    columns = []
+    column = 1
+    for space, value, bad in TOKEN_PATTERN.findall(line):
+        column += len(space)
+        if bad:
+            if bad == "'":
+                raise syntax_error("unterminated string", line_number, column)
+            raise syntax_error(f"unexpected character {bad!r}", line_number, column)
+        values.append(value)
+        columns.append(column)
+        column += len(value)
+    return values, columns
+
+
+class Parser:
+    """Нисходящий разбор по лексемам с просмотром на одну лексему вперёд.
+
+    Грамматика:
+        программа  := привязка* конец
+        привязка   := значение '->' имя ';'
+        значение   := число | строка | имя | вызов | '{' выражение '}'
+        вызов      := имя '(' [значение (',' значение)*] ')'
+
+    Строки подаются по одной (feed), лексемы накапливаются до ближайшей ';', поэтому
+    в памяти находятся только лексемы ещё не разобранных привязок, а привязка может
+    занимать несколько строк.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.lines = []
+        self.columns = []
+        self.pos = 0
+        # Лексемы незаконченной привязки: (тексты, строки, столбцы)
+        self.pending = ([], [], [])
+        self.end = (1, 1)
+
+    def describe(self, pos):
+        return repr(self.values[pos]) if self.values[pos] != END else "end of file"
+
+    def error(self, message, pos):
+        return syntax_error(message, self.lines[pos], self.columns[pos])
+
+    def expect(self, value):
+        pos = self.pos
+        if self.values[pos] != value:
+            raise self.error(f"expected {value!r}, found {self.describe(pos)}", pos)
+        self.pos = pos + 1
+
+    def feed(self, line_number, line):
+        """Добавляет строку входа и возвращает привязки, законченные в ней.
+
+        Комментарием строка считается только между привязками: внутри незаконченной
+        привязки строка, начинающаяся со строки в кавычках, — её продолжение.
+        """
+        values, lines, columns = self.pending
+        if not values and is_comment(line):
+            return []
+        line_values, line_columns = tokenize_line(line, line_number)
+        if not line_values:
+            return []
+        self.end = (line_number, line_columns[-1] + len(line_values[-1]))
+        if not values and line_values[-1] == ";":
+            # Обычный случай: строка из законченных привязок, переносить нечего
+            line_values.append(END)
+            line_columns.append(line_columns[-1] + 1)
+            return self.parse(line_values, [line_number] * len(line_values), line_columns)
+        if ";" not in line_values:
+            values += line_values
+            lines += [line_number] * len(line_values)
+            columns += line_columns
+            return []
+        # Все лексемы до последней ';' образуют законченные привязки; ищем её только в новой строке
+        last = len(line_values) - line_values[::-1].index(";")
+        if values:
+            last += len(values)
+            values += line_values
+            lines += [line_number] * len(line_values)
+            columns += line_columns
         else:
-            content = expr[expr.index("(")+1:expr.index(")")]
-            return parse_array(content, data)
-    # Если это переменная, проверяем её наличие в data
-    if expr in data:
-        return data[expr]
-    raise ValueError(f"Undefined variable or missing quotes: '{expr}'. If this is a string, it should be in single quotes.")
-
-
-def parse_array(content, data):
-    """Парсинг содержимого массива, включая вложенные структуры."""
-    content = content.strip()
-    if not content:  # Если содержимое пустое, возвращаем пустой массив
-        return []
-    
-    elements = split_array_elements(content)
-    result = []
-    for element in elements:
-        element = element.strip()
-        if element.startswith("'") and element.endswith("'"):
-            # Строки в кавычках оставляем как есть
-            result.append(element)
-        elif element.isdigit():
-            # Числовые значения преобразуем в int
-            result.append(int(element))
-        elif element.startswith("array("):
-            # Рекурсивно обрабатываем вложенные массивы
-            inner_content = element[element.index("(")+1:element.rindex(")")]
-            result.append(parse_array(inner_content, data))
-        elif "pow(" in element:
-            # Обработка функции pow
-            args = element[element.index("(")+1:element.rindex(")")].split(",")
-            result.append(pow(int(args[0].strip()), int(args[1].strip())))
+            values, lines, columns = line_values, [line_number] * len(line_values), line_columns
+        if last < len(values):
+            self.pending = (values[last:], lines[last:], columns[last:])
         else:
-            # Если это переменная, проверяем её наличие в data
-            if element in data:
-                result.append(data[element])
+            self.pending = ([], [], [])
+        # Хвост после ';' уже перенесён в pending; на его место встаёт END
+        values[last:] = [END]
+        lines[last:] = [lines[last - 1]]
+        columns[last:] = [columns[last - 1] + 1]
+        return self.parse(values, lines, columns)
+
+    def finish(self):
+        """Разбирает остаток входа: незаконченная привязка даёт синтаксическую ошибку."""
+        values, lines, columns = self.pending
+        self.pending = ([], [], [])
+        return self.parse(values + [END], lines + [self.end[0]], columns + [self.end[1]])
+
+    def parse(self, values, lines, columns):
+        """Разбирает все привязки в лексемах, заканчивающихся END."""
+        self.values, self.lines, self.columns, self.pos = values, lines, columns, 0
+        bindings = []
+        while values[self.pos] != END:
+            bindings.append(self.next_binding())
+        return bindings
+
+    def bindings(self, lines):
+        """Выдаёт привязки по мере разбора, не накапливая всю программу.
+
+        lines может быть файлом: строки читаются по одной, без загрузки всего входа.
+        """
+        for line_number, line in enumerate(lines, 1):
+            yield from self.feed(line_number, line)
+        yield from self.finish()
+
+    def next_binding(self):
+        start = self.pos
+        value = self.value()
+        # На верхнем уровне допустимы только константы, вызовы функций и выражения
+        if not isinstance(value, (Number, Call, Expression)):
+            raise self.error("expected a number, a function call or {expression}", start)
+        self.expect("->")
+        pos = self.pos
+        name = self.values[pos]
+        if not (name[:1].isalpha() or name[:1] == "_"):
+            raise self.error(f"expected a name, found {self.describe(pos)}", pos)
+        self.pos = pos + 1
+        self.expect(";")
+        return Binding(value, name, self.lines[start], self.columns[start])
+
+    def value(self):
+        """Разбирает значение; незакрытые вызовы хранятся в явном стеке, а не в стеке интерпретатора.
+
+        Элемент стека — (функция, позиция имени, разобранные аргументы). Глубина вложенности
+        поэтому не ограничена глубиной рекурсии.
+        """
+        values, lines, columns = self.values, self.lines, self.columns
+        pos = self.pos
+        stack = []
+        while True:
+            token = values[pos]
+            first = token[:1]
+            if first.isdigit():
+                node = Number(int(token), lines[pos], columns[pos])
+                pos += 1
+            elif first == "'":
+                node = String(token, lines[pos], columns[pos])
+                pos += 1
+            elif first.isalpha() or first == "_":
+                if values[pos + 1] != "(":
+                    node = Name(token, lines[pos], columns[pos])
+                    pos += 1
+                elif values[pos + 2] != ")":
+                    stack.append((token, pos, []))
+                    pos += 2
+                    continue
+                else:
+                    node = Call(token, [], lines[pos], columns[pos])
+                    pos += 3
+            elif first == "{":
+                self.pos = pos
+                node = self.expression()
+                pos = self.pos
             else:
-                raise ValueError(f"Undefined variable or missing quotes: '{element}'. If this is a string, it should be in single quotes.")
-    
-    return result
+                raise self.error(f"expected a value, found {self.describe(pos)}", pos)
+            # Значение — очередной аргумент открытого вызова; ')' закрывает вызов
+            while stack:
+                func, start, args = stack[-1]
+                args.append(node)
+                token = values[pos]
+                if token == ",":
+                    pos += 1
+                    break
+                if token != ")":
+                    raise self.error(f"expected ')', found {self.describe(pos)}", pos)
+                pos += 1
+                stack.pop()
+                node = Call(func, args, lines[start], columns[start])
+            else:
+                self.pos = pos
+                return node
 
+    def expression(self):
+        start = self.pos
+        pos = start + 1
+        values = self.values
+        while values[pos] != "}":
+            if values[pos] in (END, ";", "->"):
+                raise self.error("unterminated expression, expected '}'", start)
+            pos += 1
+        if pos == start + 1:
+            raise self.error("empty expression", start)
+        tokens = [(values[i], self.lines[i], self.columns[i]) for i in range(start + 1, pos)]
+        self.pos = pos + 1
+        return Expression(tokens, self.lines[start], self.columns[start])
 
-def split_array_elements(array_content):
-    """Разделяет элементы массива, учитывая вложенные структуры."""
-    elements = []
-    current = ""
-    nesting = 0
-    
-    for char in array_content:
-        if char in '({[':  # Handle nested structures
-            nesting += 1
-            current += char
-        elif char in ')}]':
-            nesting -= 1
-            current += char
-        elif char == ',' and nesting == 0:  # Split only at top-level commas
-            elements.append(current.strip())
-            current = ""
+
+def parse_program(lines):
+    """Строит синтаксическое дерево всей программы: список привязок."""
+    return list(Parser().bindings(lines))
+
+
+def undefined_name(name, line, column):
+    return ValueError(f"Undefined variable or missing quotes: '{name}' at line {line}, column {column}. "
+                      f"If this is a string, it should be in single quotes.")
+
+
+def evaluate_leaf(node, data):
+    """Вычисляет узел без аргументов: константу, имя или выражение."""
+    if isinstance(node, (Number, String)):
+        # Строки в кавычках оставляем как есть
+        return node.value
+    if isinstance(node, Name):
+        if node.name in data:
+            return data[node.name]
+        raise undefined_name(node.name, node.line, node.column)
+    return run_expression(tuple(token[0] for token in node.tokens), data)
+
+
+def evaluate_call(node, args):
+    if node.func == "pow":
+        if len(args) != 2 or not all(isinstance(arg, int) for arg in args):
+            raise ValueError(f"pow expects two integers at line {node.line}, column {node.column}")
+        return pow(args[0], args[1])
+    # Любой другой вызов функции интерпретируется как массив
+    return args
+
+
+def evaluate(node, data):
+    """Вычисляет значение узла дерева; data — уже объявленные имена.
+
+    Вложенные вызовы обходятся с явным стеком (вызов, вычисленные аргументы, оставшиеся
+    аргументы), поэтому глубина вложенности не ограничена стеком интерпретатора.
+    """
+    if not isinstance(node, Call):
+        return evaluate_leaf(node, data)
+    stack = [(node, [], iter(node.args))]
+    while True:
+        call, args, rest = stack[-1]
+        for arg in rest:
+            kind = type(arg)
+            if kind is Call:
+                stack.append((arg, [], iter(arg.args)))
+                break
+            args.append(arg.value if kind is Number or kind is String else evaluate_leaf(arg, data))
         else:
-            current += char
-    
-    if current:  # Add the last element
-        elements.append(current.strip())
-    
-    return elements
+            stack.pop()
+            value = evaluate_call(call, args)
+            if not stack:
+                return value
+            stack[-1][1].append(value)
+
+
+def iter_bindings(file_path):
+    """Потоковый разбор: выдаёт (имя, значение) каждой привязки сразу после её вычисления.
+
+    Файл читается построчно; в памяти остаются только значения объявленных имён,
+    на которые могут сослаться следующие привязки.
+    """
+    with open(file_path, 'r') as file:
+        data = {}
+        for binding in Parser().bindings(file):
+            value = evaluate(binding.value, data)
+            data[binding.name] = value
+            yield binding.name, value
+
+
+def parse_file(file_path):
+    return dict(iter_bindings(file_path))
+
+
+# Операции константных выражений: / — деление без округления, mod и pow записываются как вызовы
+BINARY_OPERATORS = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+FUNCTIONS = {"pow": pow, "mod": operator.mod}
+# Сколько скомпилированных выражений хранить для повторного использования
+EXPRESSION_CACHE_SIZE = 4096
+
+# Значение поддерева выражения, не зависящее от имён (результат свёртки констант)
+Constant = namedtuple("Constant", "value")
+
+
+class ExpressionCompiler:
+    """Компилирует лексемы константного выражения в функцию data -> значение.
+
+    Грамматика (приоритеты как в Python):
+        сумма      := произведение (('+' | '-') произведение)*
+        произведение := унарное (('*' | '/') унарное)*
+        унарное    := ('-' | '+') унарное | первичное
+        первичное  := число | строка | имя | функция '(' сумма (',' сумма)* ')' | '(' сумма ')'
+
+    Поддеревья, в которых нет имён, вычисляются сразу (свёртка констант).
+    """
+
+    def __init__(self, tokens):
+        self.tokens = list(tokens) + [END]
+        self.pos = 0
+
+    def error(self, message):
+        return ValueError(f"Error evaluating expression '{' '.join(self.tokens[:-1])}': {message}")
+
+    def advance(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, value):
+        token = self.advance()
+        if token != value:
+            raise self.error(f"expected {value!r}, found {token!r}" if token != END else f"expected {value!r}")
+
+    def compile(self):
+        try:
+            node = self.sum()
+        except RecursionError:
+            # Глубина скобок и вложенных вызовов ограничена стеком интерпретатора
+            raise self.error("nesting too deep") from None
+        if self.tokens[self.pos] != END:
+            raise self.error(f"unexpected {self.tokens[self.pos]!r}")
+        if isinstance(node, Constant):
+            value = node.value
+            return lambda data: value
+        return node
+
+    def apply(self, func, operands):
+        """Узел применения func к операндам; если все операнды — константы, вычисляет его сразу."""
+        if all(isinstance(operand, Constant) for operand in operands):
+            try:
+                return Constant(func(*(operand.value for operand in operands)))
+            except (ArithmeticError, TypeError, ValueError) as e:
+                raise self.error(e) from None
+        first, second = [as_function(operand) for operand in operands]
+        return lambda data: func(first(data), second(data))
+
+    def sum(self):
+        return self.chain(self.product, ("+", "-"))
+
+    def product(self):
+        return self.chain(self.unary, ("*", "/"))
+
+    def chain(self, operand, operators):
+        """Левоассоциативная цепочка операнд (оператор операнд)* как один узел.
+
+        Константное начало цепочки сворачивается сразу, остальные операнды вычисляются
+        в цикле: длинная сумма не превращается в тысячи вложенных замыканий.
+        """
+        left = operand()
+        steps = []
+        while self.tokens[self.pos] in operators:
+            func = BINARY_OPERATORS[self.advance()]
+            right = operand()
+            if not steps and isinstance(left, Constant) and isinstance(right, Constant):
+                left = self.apply(func, [left, right])
+            else:
+                steps.append((func, as_function(right)))
+        if not steps:
+            return left
+        first = as_function(left)
+
+        def run(data):
+            value = first(data)
+            for func, get in steps:
+                value = func(value, get(data))
+            return value
+        return run
+
+    def unary(self):
+        funcs = []
+        while self.tokens[self.pos] in ("-", "+"):
+            funcs.append(operator.neg if self.advance() == "-" else operator.pos)
+        node = self.primary()
+        if not funcs:
+            return node
+        funcs.reverse()  # Ближайший к операнду знак применяется первым
+        if isinstance(node, Constant):
+            for func in funcs:
+                node = self.apply(func, [node])
+            return node
+
+        def run(data):
+            value = node(data)
+            for func in funcs:
+                value = func(value)
+            return value
+        return run
+
+    def primary(self):
+        token = self.advance()
+        first = token[:1]
+        if first.isdigit():
+            return Constant(int(token))
+        if first == "'":
+            # Строки в кавычках оставляем как есть
+            return Constant(token)
+        if first == "(":
+            node = self.sum()
+            self.expect(")")
+            return node
+        if first.isalpha() or first == "_":
+            if self.tokens[self.pos] == "(":
+                return self.call(token)
+            return variable(token)
+        raise self.error(f"unexpected {token!r}" if token != END else "unexpected end of expression")
+
+    def call(self, name):
+        if name not in FUNCTIONS:
+            raise self.error(f"unknown function '{name}'")
+        self.advance()  # "("
+        args = [self.sum()]
+        while self.tokens[self.pos] == ",":
+            self.advance()
+            args.append(self.sum())
+        self.expect(")")
+        if len(args) != 2:
+            raise self.error(f"{name} expects 2 arguments, got {len(args)}")
+        return self.apply(FUNCTIONS[name], args)
+
+
+def as_function(node):
+    if isinstance(node, Constant):
+        value = node.value
+        return lambda data: value
+    return node
+
+
+def variable(name):
+    def get(data):
+        if name in data:
+            return data[name]
+        raise NameError(f"name '{name}' is not defined")
+    return get
+
+
+@functools.lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(tokens):
+    """Скомпилированное выражение по кортежу лексем (без фигурных скобок)."""
+    return ExpressionCompiler(tokens).compile()
+
+
+def run_expression(tokens, data):
+    """Вычисляет выражение из лексем; ошибки вычисления сообщаются как ValueError."""
+    compiled = compile_expression(tokens)
+    try:
+        return compiled(data)
+    except (ArithmeticError, TypeError, ValueError, NameError, RecursionError) as e:
+        raise ValueError(f"Error evaluating expression '{' '.join(tokens)}': {e}") from None
 
 
 def eval_constant_expression(expr, data):
     """Вычисляет значения выражений, поддерживает арифметические операции."""
     expr = expr[1:-1]  # Удаляем { и }
-    tokens = re.split(r'(\s+|\+|\-|\*|/|\(|\)|,)', expr)
-    tokens = [t.strip() for t in tokens if t.strip()]
-
-    # Замена имен на их значения
-    for i, token in enumerate(tokens):
-        if token in data:
-            tokens[i] = str(data[token])
-        elif token.isdigit():
-            tokens[i] = str(token)
-
-    # Преобразование в строку для eval
-    expr_eval = " ".join(tokens)
-    try:
-        return eval(expr_eval, {"__builtins__": None}, {"pow": pow, "mod": lambda x, y: x % y})
-    except Exception as e:
-        raise ValueError(f"Error evaluating expression '{expr}': {e}")
+    tokens = []
+    for space, value, bad in TOKEN_PATTERN.findall(expr):
+        if bad:
+            raise ValueError(f"Error evaluating expression '{expr}': unexpected character {bad!r}")
+        tokens.append(value)
+    return run_expression(tuple(tokens), data)
 
 
 def clean_array(value):
@@ -169,19 +512,49 @@ def write_toml(data, output_path):
         print(f"Error writing to file: {e}")
 
 
+def write_toml_stream(bindings, output_path):
+    """Записывает привязки в TOML по одной, по мере их поступления.
+
+    Файл сначала пишется во временный и заменяет output_path только после успешной
+    записи всех привязок. Значение уже записанного имени изменить нельзя, поэтому
+    повторное объявление считается ошибкой. Возвращает число записанных привязок.
+    """
+    written = set()
+    temp_path = output_path + ".tmp"
+    try:
+        with open(temp_path, 'w') as file:
+            for name, value in bindings:
+                if name in written:
+                    raise ValueError(f"Redefinition of '{name}' is not supported in streaming mode")
+                written.add(name)
+                file.write(toml.dumps({name: clean_array(value)}))
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return len(written)
+
+
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python parser.py <input_file> <output_file>")
+    args = sys.argv[1:]
+    stream = "--stream" in args
+    if stream:
+        args.remove("--stream")
+    if len(args) != 2:
+        print("Usage: python parser.py [--stream] <input_file> <output_file>")
         sys.exit(1)
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    input_file, output_file = args
     
     try:
         print(f"Parsing file: {input_file}")
-        data = parse_file(input_file)
-        print("Parsed data:", data)
-        write_toml(data, output_file)
+        if stream:
+            count = write_toml_stream(iter_bindings(input_file), output_file)
+            print(f"Written {count} bindings to {output_file}")
+        else:
+            data = parse_file(input_file)
+            print("Parsed data:", data)
+            write_toml(data, output_file)
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
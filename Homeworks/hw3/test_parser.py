@@ -1,6 +1,7 @@
 import unittest
 import os
-from parser import parse_file, write_toml
+from parser import (parse_file, write_toml, write_toml_stream, iter_bindings, parse_program,
+                    eval_constant_expression, Binding, Call, Number, String, Expression)
 import toml
 
 # Тестирование парсера TOML
@@ -64,6 +65,138 @@ class TestConfigParser(unittest.TestCase):
             
         # Очистка
         os.remove(test_file)
+    # Тестирование позиции синтаксической ошибки
+    def test_syntax_error_position(self):
+        test_file = os.path.join(self.test_dir, 'test_syntax.txt')
+        with open(test_file, 'w') as f:
+            f.write("' комментарий\n10 -> a;\narray(1 2) -> b;\n")
+        try:
+            with self.assertRaisesRegex(SyntaxError, r"line 3, column 9: expected '\)'"):
+                parse_file(test_file)
+            # Неожиданный конец файла сообщается сразу за последней лексемой
+            with open(test_file, 'w') as f:
+                f.write("10 -> a\n\n")
+            with self.assertRaisesRegex(SyntaxError, "line 1, column 8: expected ';', found end of file"):
+                parse_file(test_file)
+        finally:
+            os.remove(test_file)
+
+    # Тестирование синтаксического дерева
+    def test_parse_program(self):
+        program = parse_program(["array(1, {a + 1}) -> b;\n", "# комментарий\n", "pow(2,\n", "3) -> c;\n"])
+        self.assertEqual(len(program), 2)
+        first = program[0]
+        self.assertIsInstance(first, Binding)
+        self.assertEqual((first.name, first.line, first.column), ("b", 1, 1))
+        self.assertIsInstance(first.value, Call)
+        self.assertEqual(first.value.args[0], Number(1, 1, 7))
+        self.assertIsInstance(first.value.args[1], Expression)
+        self.assertEqual(program[1].value.func, "pow")
+
+    # Строка, начинающаяся с кавычки, внутри привязки — продолжение, а не комментарий
+    def test_string_continuation_lines(self):
+        program = parse_program(["' комментарий\n", "array(\n", "'a',\n", "'b') -> x;\n", "'b' комментарий\n"])
+        self.assertEqual(len(program), 1)
+        self.assertEqual(program[0].value.args, [String("'a'", 3, 1), String("'b'", 4, 1)])
+
+    # Тестирование вложенных массивов, функций и выражений
+    def test_nested_values(self):
+        test_file = os.path.join(self.test_dir, 'test_nested.txt')
+        with open(test_file, 'w') as f:
+            f.write("10 -> a;\n"
+                    "pow(2, 10) -> b;\n"
+                    "{pow(a, 2) - mod(b, 7)} -> c;\n"
+                    "array(1, 'x', array(a, pow(3, 3)), array()) -> d;\n")
+        try:
+            data = parse_file(test_file)
+        finally:
+            os.remove(test_file)
+        self.assertEqual(data, {'a': 10, 'b': 1024, 'c': 98, 'd': [1, "'x'", [10, 27], []]})
+
+    # Тестирование разделения элементов массива
+    def test_array_elements(self):
+        test_file = os.path.join(self.test_dir, 'test_arrays.txt')
+        nested = "array(" * 300 + "'leaf'" + ")" * 300
+        try:
+            with open(test_file, 'w') as f:
+                f.write("1 -> a;\n"
+                        "array( 1, 'a, b', array(a, {a + 1}), pow(2, 3) ) -> b;\n"
+                        "array(  ) -> c;\n"
+                        f"array({nested}, a) -> d;\n")
+            data = parse_file(test_file)
+            self.assertEqual(data['b'], [1, "'a, b'", [1, 2], 8])
+            self.assertEqual(data['c'], [])
+            value = data['d']
+            self.assertEqual(value[1], 1)
+            for _ in range(301):
+                value = value[0]
+            self.assertEqual(value, "'leaf'")
+            with open(test_file, 'w') as f:
+                f.write("array(array(1) -> a;\n")
+            with self.assertRaises(SyntaxError):
+                parse_file(test_file)
+        finally:
+            os.remove(test_file)
+
+    # Глубина вложенности не ограничена стеком интерпретатора
+    def test_deep_nesting(self):
+        test_file = os.path.join(self.test_dir, 'test_deep.txt')
+        depth = 5000
+        try:
+            with open(test_file, 'w') as f:
+                f.write("2 -> a;\n" + "array(" * depth + "pow(a, 3)" + ")" * depth + " -> b;\n")
+            value = parse_file(test_file)['b']
+            for _ in range(depth):
+                value = value[0]
+            self.assertEqual(value, 8)
+            with open(test_file, 'w') as f:
+                f.write("array(" * depth + "1" + ")" * (depth - 1) + " -> b;\n")
+            with self.assertRaisesRegex(SyntaxError, "expected '\\)', found '->'"):
+                parse_file(test_file)
+        finally:
+            os.remove(test_file)
+
+    # Тестирование вычисления константных выражений без eval
+    def test_constant_expressions(self):
+        data = {'a': 10, 'b': 3, 'l': [1, 2]}
+        self.assertEqual(eval_constant_expression("{-a * (b + 1) + 2 * 3}", data), -34)
+        self.assertEqual(eval_constant_expression("{a / 4}", data), 2.5)
+        self.assertEqual(eval_constant_expression("{pow(a, 2) - mod(b, 2)}", data), 99)
+        # Списки сохраняют тип, а не превращаются в строку
+        self.assertEqual(eval_constant_expression("{l + l}", data), [1, 2, 1, 2])
+        for expr in ("{x + 1}", "{1 / 0}", "{pow(1)}", "{__import__('os')}", "{a.real}"):
+            with self.assertRaises(ValueError):
+                eval_constant_expression(expr, data)
+
+    # Длинные цепочки операций и глубокая вложенность скобок
+    def test_long_expressions(self):
+        data = {'a': 2, 'b': 3}
+        self.assertEqual(eval_constant_expression("{" + " + ".join(["a"] * 5000) + "}", data), 10000)
+        self.assertEqual(eval_constant_expression("{1 + " + " - b * a".join([""] * 3001) + "}", data), -17999)
+        self.assertEqual(eval_constant_expression("{" + "-" * 5000 + "a}", data), 2)
+        with self.assertRaisesRegex(ValueError, "Error evaluating expression"):
+            eval_constant_expression("{" + "(" * 5000 + "a" + ")" * 5000 + "}", data)
+
+    # Тестирование потоковой записи в TOML
+    def test_stream_mode(self):
+        test_file = os.path.join(self.test_dir, 'test_stream.txt')
+        with open(test_file, 'w') as f:
+            f.write("10 -> a;\n{a * 2} -> b;\narray(array(a, b), array('x')) -> c;\n")
+        try:
+            count = write_toml_stream(iter_bindings(test_file), self.test_output)
+            self.assertEqual(count, 3)
+            with open(self.test_output, 'r') as f:
+                self.assertEqual(toml.load(f), {'a': 10, 'b': 20, 'c': [[10, 20], ["'x'"]]})
+            os.remove(self.test_output)
+            # Повторное объявление нельзя записать потоком: выходной файл не создаётся
+            with open(test_file, 'a') as f:
+                f.write("1 -> a;\n")
+            with self.assertRaises(ValueError):
+                write_toml_stream(iter_bindings(test_file), self.test_output)
+            self.assertFalse(os.path.exists(self.test_output))
+        finally:
+            os.remove(test_file)
+
 
 if __name__ == '__main__':
     unittest.main()